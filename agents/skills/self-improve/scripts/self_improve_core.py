@@ -0,0 +1,3306 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import io
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, astuple, dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial, wraps
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable, Union
+
+
+CODEX_HOME = Path(os.environ.get("CODEX_HOME", Path.home() / ".codex")).expanduser()
+STATE_DB = CODEX_HOME / "state_5.sqlite"
+INDEX_DB = CODEX_HOME / "self_improve.sqlite"
+ROLLOUT_ROOTS = (
+    CODEX_HOME / "sessions",
+    CODEX_HOME / "archived_sessions",
+)
+SKILLS_ROOT = CODEX_HOME / "skills"
+SKILL_ROOTS = (
+    CODEX_HOME / "skills",
+    Path.home() / ".agents" / "skills",
+)
+USER_MESSAGE_MARKER = b'"user_message"'
+TOOL_CALL_MARKER = b'"function_call'
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+GLOBAL_AGENTS = CODEX_HOME / "AGENTS.md"
+REPO_SEARCH_ROOTS = (
+    Path.home() / "dev",
+    Path.home() / "code",
+    Path.home() / "personal",
+)
+
+PREFERENCE_MARKERS = (
+    "make sure",
+    "default to",
+    "prefer",
+    "instead of",
+    "do not",
+    "don't",
+    "never",
+    "always",
+    "should be",
+    "should default",
+    "i want you to",
+    "i don't want",
+    "preserve",
+    "keep ",
+    "lean on",
+    "continue",
+    "keep going",
+    "don't stop",
+    "come on",
+    "can't you just",
+)
+
+ROLLOUT_NAME_RE = re.compile(
+    r"^rollout-(?:\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}-)?(?P<thread_id>.+)\.jsonl(?:\.gz|\.zst)?$"
+)
+ROLLOUT_CODECS = {
+    "gzip": (b"\x1f\x8b", ".gz"),
+    "zstd": (b"\x28\xb5\x2f\xfd", ".zst"),
+}
+
+# Signal-extraction patterns stay source strings here; signal_rules() compiles them
+# on first use so list/show never pay for them.
+SKIP_USER_MESSAGE_PATTERN = r"<INSTRUCTIONS>|#\s*AGENTS\.md instructions|PLEASE IMPLEMENT THIS PLAN"
+
+COMMON_WORDS = {
+    "about",
+    "after",
+    "again",
+    "also",
+    "because",
+    "could",
+    "default",
+    "doing",
+    "first",
+    "have",
+    "instead",
+    "maybe",
+    "please",
+    "should",
+    "that",
+    "their",
+    "there",
+    "these",
+    "thing",
+    "things",
+    "this",
+    "those",
+    "using",
+    "want",
+    "would",
+    "write",
+    "your",
+}
+
+NOISY_SNIPPET_PATTERN = (
+    r"```|^#+\s|^[-+]{1,3}|^comment:\s|^file:\s|^lines:\s|"
+    r"^(key changes|implementation|summary|test plan|assumptions)\b|"
+    r"diff hunk|review findings|my request for codex"
+)
+
+QUESTION_PREFIXES = (
+    "okay, can you",
+    "ok, can you",
+    "what should",
+    "how should",
+    "how do you think",
+    "also, what",
+    "also what",
+    "can you propose",
+    "can you look",
+    "could you look",
+    "first can you",
+    "i feel like",
+    "they all",
+    "they don't",
+    "they do not",
+)
+
+PROJECT_CONTEXT_TOKENS = (
+    "agnts.md",
+    "agents.md",
+    "readme",
+    "outline",
+    "packet",
+    "this repo",
+    "this project",
+    "in the project",
+    "in this project",
+    "in this repo",
+    "shadcn",
+    "tailwind",
+    "vite",
+    "react",
+    "package",
+    "implementation",
+    "component",
+    "widget",
+    "template",
+    "api",
+    "demo",
+    "voice",
+    "audio",
+    "docs",
+    "slack",
+    "pending slack replies",
+    "resolved threads",
+    "none right now",
+    "vault",
+    "screenshot",
+)
+
+PROJECT_IMPLEMENTATION_TOKENS = (
+    "activation gating",
+    "app-local state",
+    "dom-derived",
+    "selected widget",
+    "event handlers",
+    "typed fields",
+    "streaming tokens",
+    "audio output",
+    "system message",
+)
+
+TRANSIENT_ERROR_TOKENS = (
+    "correct access rights and the repository exists",
+    "fatal: could not read from remote repository",
+    "repository not found",
+)
+
+GLOBAL_SCOPE_TOKENS = (
+    "globally",
+    "all repos",
+    "all projects",
+    "for any repo",
+    "across repos",
+)
+
+VAULT_CONTEXT_TOKENS = (
+    "pending slack replies",
+    "resolved threads",
+    "none right now",
+    "fyi",
+    "slack",
+)
+
+SUGGESTION_REWRITE_PATTERNS = (
+    (r"^(okay|ok|yeah|and then)[, ]+", ""),
+    (r"^(can you|could you)\s+(please\s+)?", ""),
+    (r"^make sure\s+(that\s+)?", ""),
+    (r"^i want you to\s+", ""),
+    (r"^i want the\s+", "Keep the "),
+    (r"^let'?s\s+", "Prefer to "),
+    (r"\b(relatively speaking|kind of|sort of|basically|actually|really|like)\b", ""),
+    (r"\bto\s+not\s+have\s+any(?:\s+kind\s+of)?\s+incongruenc(?:y|ies)\b", "to avoid contradictions"),
+    (r"\bmake sure everything'?s aligned\b", "keep related docs aligned"),
+    (r"\breads much more\s+a human documentation\b", "read like human-authored documentation"),
+    (r"\breads much more\s+human documentation\b", "read like human-authored documentation"),
+    (r"\bnothing is over-engineered\b", "avoid over-engineering"),
+    (r"\s+", " "),
+)
+
+LEADING_REFERENT_PATTERN = r"^(that|all of this)[, ]+"
+
+NORMALIZE_MEMO_SIZE = 65536
+
+SHINGLE_SIZE = 4
+SHINGLE_HASH_MEMO_SIZE = 65536
+NEAR_DUPLICATE_RATIO = 0.9
+MINHASH_SALTS = (b"minhash-0", b"minhash-1")
+LSH_BANDS = 16
+LSH_BUCKET_PROBES = 32
+NEAR_DUPLICATE_JACCARD = 0.6
+SIGNAL_BATCH_PER_JOB = 256
+SPILL_BATCH_SIZE = 5000
+FOLLOW_CHUNK_SIZE = 1 << 20
+EXPORT_BUFFER_SIZE = 1 << 20
+EXPORT_NAME_RE = re.compile(r"[^\w.-]")
+STATE_BUSY_TIMEOUT = 5.0
+STATE_BUSY_RETRIES = 5
+STATE_MMAP_SIZE = 256 << 20
+
+# stats dimensions are SQL expressions so GROUP BY runs inside SQLite. Subagent sources
+# collapse to their role instead of normalize_source's per-parent label.
+STATS_DIMENSIONS = {
+    "day": "date(created_at, 'unixepoch')",
+    "month": "strftime('%Y-%m', created_at, 'unixepoch')",
+    "model": "coalesce(nullif(model, ''), '(unknown)')",
+    "source": """
+        CASE
+            WHEN source LIKE '{%' AND json_valid(source) THEN
+                CASE json_type(source, '$.subagent')
+                    WHEN 'text' THEN 'subagent:' || json_extract(source, '$.subagent')
+                    WHEN 'object' THEN coalesce(nullif(json_extract(source, '$.subagent.thread_spawn.agent_role'), ''), 'subagent')
+                    ELSE source
+                END
+            ELSE coalesce(source, '')
+        END
+    """,
+    "cwd": "coalesce(cwd, '')",
+}
+STATS_COLUMNS = {"day": ("Day", 10), "month": ("Month", 7), "model": ("Model", 20), "source": ("Source", 24), "cwd": ("CWD", 48)}
+
+THREAD_SEARCH_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS thread_search USING fts5(
+    title,
+    cwd,
+    first_user_message,
+    messages,
+    tokenize = 'trigram'
+);
+"""
+THREAD_SEARCH_PLAIN = """
+CREATE TABLE IF NOT EXISTS thread_search (
+    title TEXT,
+    cwd TEXT,
+    first_user_message TEXT,
+    messages TEXT
+);
+"""
+
+# dataclass(slots=True) is 3.10+; the script still has to run on macOS's /usr/bin/python3 (3.9).
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollout_messages (
+    rollout_path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    messages TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS thread_search_state (
+    id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL UNIQUE,
+    updated_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollout_dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollout_files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    thread_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rollout_files_thread ON rollout_files (thread_id);
+CREATE INDEX IF NOT EXISTS rollout_files_dir ON rollout_files (dir);
+CREATE TABLE IF NOT EXISTS dream_runs (
+    scope TEXT PRIMARY KEY,
+    updated_at INTEGER NOT NULL,
+    thread_id TEXT NOT NULL
+);
+-- Ledger layout from before signals were re-classified on replay.
+DROP TABLE IF EXISTS dream_threads;
+DROP TABLE IF EXISTS dream_evidence;
+CREATE TABLE IF NOT EXISTS dream_ledger (
+    scope TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    cwd TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER NOT NULL,
+    archived INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    reasoning_effort TEXT NOT NULL,
+    rollout_path TEXT NOT NULL,
+    agent_role TEXT NOT NULL,
+    agent_nickname TEXT NOT NULL,
+    PRIMARY KEY (scope, thread_id)
+);
+CREATE TABLE IF NOT EXISTS dream_signals (
+    scope TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    signal_index INTEGER NOT NULL,
+    sentence TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    PRIMARY KEY (scope, thread_id, signal_index)
+);
+CREATE TABLE IF NOT EXISTS signal_cache (
+    content_hash TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    signals TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollout_moves (
+    original TEXT PRIMARY KEY,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repo_roots (
+    search_root TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    names TEXT NOT NULL
+);
+"""
+# ThreadRecord field order, so ledger rows round-trip through astuple/thread_record.
+LEDGER_THREAD_COLUMNS = (
+    "thread_id, title, source, cwd, created_at, updated_at, archived, "
+    "model, reasoning_effort, rollout_path, agent_role, agent_nickname"
+)
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class ThreadRecord:
+    thread_id: str
+    title: str
+    source: str
+    cwd: str
+    created_at: int
+    updated_at: int
+    archived: bool
+    model: str
+    reasoning_effort: str
+    rollout_path: str
+    agent_role: str
+    agent_nickname: str
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class Evidence:
+    thread_id: str
+    title: str
+    updated_at: int
+    rollout_path: str
+    cwd: str
+    cluster_key: str
+
+
+@dataclass(**DATACLASS_SLOTS)
+class Proposal:
+    bucket: str
+    target: str
+    suggestion: str
+    evidence: list[Evidence] = field(default_factory=list)
+    thread_ids: set[str] = field(default_factory=set, repr=False)
+    cluster_keys: set[str] = field(default_factory=set, repr=False)
+    last_seen: int = 0
+    confidence: float = 0.0
+
+    @property
+    def support(self) -> int:
+        return len(self.cluster_keys)
+
+    def add_evidence(self, item: Evidence) -> None:
+        if item.thread_id in self.thread_ids:
+            return
+        self.thread_ids.add(item.thread_id)
+        self.cluster_keys.add(item.cluster_key)
+        self.evidence.append(item)
+        self.last_seen = max(self.last_seen, item.updated_at)
+
+    def freeze(self) -> Proposal:
+        self.confidence = proposal_confidence(self.bucket, self.suggestion, self.support)
+        return self
+
+
+def proposal_confidence(bucket: str, suggestion: str, support: int) -> float:
+    score = 0.42 + min(support, 6) * 0.12
+    lowered = suggestion.lower()
+
+    if lowered.startswith(("i ", "this ", "that ", "only ", "leave room for")):
+        score -= 0.18
+    if any(token in lowered for token in (" kind of ", " sort of ", " maybe ", " thing ", " stuff ")):
+        score -= 0.08
+    if any(token in lowered for token in ("create sub-agents", "keep improving the complexity", "let's just iterate")):
+        score -= 0.24
+    if "?" in suggestion:
+        score -= 0.18
+    if bucket == "Global AGENTS.md" and literal_any(signal_rules().project_implementation, lowered):
+        score -= 0.22
+    if "human-authored documentation" in lowered or "over-engineering" in lowered:
+        score += 0.08
+    if any(token in lowered for token in ("continue", "keep going", "don't stop", "frustration cues")):
+        score += 0.08
+
+    return max(0.0, min(0.99, score))
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class ThreadSpan:
+    count: int
+    oldest: int
+    newest: int
+
+
+@dataclass
+class RolloutScanStats:
+    files: int = 0
+    bytes_skipped: int = 0
+    bytes_decoded: int = 0
+    events_decoded: int = 0
+
+
+@dataclass
+class ReindexStats:
+    directories: int = 0
+    rescanned: int = 0
+    rollouts: int = 0
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class SessionMeta:
+    thread_id: str
+    cwd: str
+    payload: dict[str, Any]
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class EventMsg:
+    kind: str
+    message: str
+    phase: str
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class ResponseMessage:
+    role: str
+    content: tuple[Any, ...]
+
+    @property
+    def text(self) -> str:
+        return extract_message_text({"content": self.content})
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class FunctionCall:
+    name: str
+    arguments: str
+    call_id: str
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class FunctionCallOutput:
+    call_id: str
+    output: str
+
+
+RolloutEvent = Union[SessionMeta, EventMsg, ResponseMessage, FunctionCall, FunctionCallOutput]
+ROLLOUT_EVENT_KINDS = {
+    SessionMeta: "session_meta",
+    EventMsg: "event_msg",
+    ResponseMessage: "message",
+    FunctionCall: "function_call",
+    FunctionCallOutput: "function_call_output",
+}
+
+
+@dataclass(frozen=True)
+class LiteralMatcher:
+    pattern: re.Pattern[str] | None
+    outputs: dict[str, frozenset[Any]]
+    straddlers: dict[str, tuple[str, ...]]
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class SignalRules:
+    skip_user_message: re.Pattern[str]
+    noisy_snippet: re.Pattern[str]
+    leading_referent: re.Pattern[str]
+    suggestion_rewrites: tuple[tuple[re.Pattern[str], str], ...]
+    preference: LiteralMatcher
+    transient_error: LiteralMatcher
+    question_prefix: LiteralMatcher
+    project_context: LiteralMatcher
+    project_implementation: LiteralMatcher
+    global_scope: LiteralMatcher
+    vault_context: LiteralMatcher
+
+
+@dataclass(frozen=True)
+class SkillRecord:
+    name: str
+    path: Path
+    text: str
+    aliases: tuple[str, ...]
+    normalized_text: str = field(default="", compare=False, repr=False)
+    tokens: frozenset[str] = field(default=frozenset(), compare=False, repr=False)
+    shingle_index: dict[str, tuple[int, ...]] = field(default_factory=dict, compare=False, repr=False)
+    segment_sizes: tuple[int, ...] = field(default=(), compare=False, repr=False)
+
+
+COUNTERS: Counter[str] = Counter()
+TRACE_EVENT_LIMIT = 500_000
+
+
+@dataclass
+class Profiler:
+    enabled: bool = False
+    trace: bool = False
+    origin: float = 0.0
+    events: list[dict[str, Any]] = field(default_factory=list)
+
+    def start(self, *, trace: bool) -> None:
+        self.enabled = True
+        self.trace = trace
+        self.origin = time.perf_counter()
+        self.events.clear()
+
+    def record(self, stage: str, started: float, finished: float) -> None:
+        COUNTERS[f"stage.{stage}.calls"] += 1
+        COUNTERS[f"stage.{stage}.seconds"] += finished - started
+        if self.trace and len(self.events) < TRACE_EVENT_LIMIT:
+            self.events.append(
+                {
+                    "name": stage,
+                    "ph": "X",
+                    "ts": round((started - self.origin) * 1e6, 3),
+                    "dur": round((finished - started) * 1e6, 3),
+                    "pid": os.getpid(),
+                    "tid": 0,
+                }
+            )
+
+
+PROFILER = Profiler()
+
+
+def profiled(stage: str):
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PROFILER.record(stage, started, time.perf_counter())
+
+        return wrapper
+
+    return decorate
+
+
+def profiled_rows(stage: str, rows: Iterable[Any]) -> Iterable[Any]:
+    # A streamed cursor is drained between other stages: count it as one call and
+    # time only the pulls, so it reports like the eager fetch it replaces.
+    if not PROFILER.enabled:
+        yield from rows
+        return
+    COUNTERS[f"stage.{stage}.calls"] += 1
+    iterator = iter(rows)
+    while True:
+        started = time.perf_counter()
+        row = next(iterator, None)
+        COUNTERS[f"stage.{stage}.seconds"] += time.perf_counter() - started
+        if row is None:
+            return
+        yield row
+
+
+def require_db(path: Path) -> None:
+    if not path.exists():
+        raise SystemExit(f"Missing Codex state DB: {path}")
+
+
+def to_utc(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%SZ")
+
+
+def shorten(value: str, width: int) -> str:
+    value = " ".join((value or "").split())
+    if not value:
+        return ""
+    if len(value) <= width:
+        return value
+    return f"{value[: max(width - 1, 1)]}…"
+
+
+def normalize_source(source: str) -> str:
+    import json
+
+    source = source or ""
+    if not source.startswith("{"):
+        return source
+    try:
+        parsed = json.loads(source)
+    except json.JSONDecodeError:
+        return source
+    subagent = parsed.get("subagent")
+    if isinstance(subagent, str):
+        return f"subagent:{subagent}"
+    if isinstance(subagent, dict):
+        spawn = subagent.get("thread_spawn") or {}
+        role = spawn.get("agent_role") or "subagent"
+        nickname = spawn.get("agent_nickname")
+        parent = spawn.get("parent_thread_id")
+        if nickname and parent:
+            return f"{role}:{nickname}@{parent[:8]}"
+        if parent:
+            return f"{role}@{parent[:8]}"
+        return role
+    return source
+
+
+def normalize_token_key(value: str) -> str:
+    tokens = [
+        token
+        for token in re.findall(r"[a-z0-9]+", value.lower())
+        if token not in COMMON_WORDS
+    ]
+    return "-".join(tokens[:12])
+
+
+def normalize_tokens(value: str) -> set[str]:
+    return {
+        token
+        for token in re.findall(r"[a-z0-9]+", value.lower())
+        if token not in COMMON_WORDS and len(token) > 2
+    }
+
+
+def build_literal_matcher(owners: dict[str, Iterable[Any]]) -> LiteralMatcher:
+    owners = {literal: frozenset(labels) for literal, labels in owners.items() if literal}
+    if not owners:
+        return LiteralMatcher(pattern=None, outputs={}, straddlers={})
+
+    # findall reports non-overlapping, longest-first hits. Any literal inside a hit is
+    # folded into that hit's outputs; a literal that could start inside a hit and run
+    # past its end is a straddler and is confirmed with a plain substring check.
+    literals = sorted(owners, key=len, reverse=True)
+    outputs: dict[str, frozenset[Any]] = {}
+    straddlers: dict[str, tuple[str, ...]] = {}
+    for literal in literals:
+        inner = [other for other in literals if other in literal]
+        outputs[literal] = frozenset(label for other in inner for label in owners[other])
+        straddlers[literal] = tuple(
+            other
+            for other in literals
+            if other not in inner and any(other.startswith(literal[start:]) for start in range(1, len(literal)))
+        )
+    pattern = re.compile("|".join(re.escape(literal) for literal in literals))
+    return LiteralMatcher(pattern=pattern, outputs=outputs, straddlers=straddlers)
+
+
+def marker_matcher(markers: Iterable[str]) -> LiteralMatcher:
+    return build_literal_matcher({marker: (marker,) for marker in markers})
+
+
+def literal_hits(matcher: LiteralMatcher, text: str) -> set[Any]:
+    if matcher.pattern is None:
+        return set()
+    hits = set(matcher.pattern.findall(text))
+    labels: set[Any] = set()
+    for literal in hits:
+        labels |= matcher.outputs[literal]
+    for literal in {other for hit in hits for other in matcher.straddlers[hit]} - hits:
+        if literal in text:
+            labels |= matcher.outputs[literal]
+    return labels
+
+
+def literal_any(matcher: LiteralMatcher, text: str) -> bool:
+    return matcher.pattern is not None and matcher.pattern.search(text) is not None
+
+
+@lru_cache(maxsize=1)
+def signal_rules() -> SignalRules:
+    return SignalRules(
+        skip_user_message=re.compile(SKIP_USER_MESSAGE_PATTERN, re.IGNORECASE),
+        noisy_snippet=re.compile(NOISY_SNIPPET_PATTERN, re.IGNORECASE),
+        leading_referent=re.compile(LEADING_REFERENT_PATTERN, re.IGNORECASE),
+        suggestion_rewrites=tuple(
+            (re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in SUGGESTION_REWRITE_PATTERNS
+        ),
+        preference=marker_matcher(PREFERENCE_MARKERS),
+        transient_error=marker_matcher(TRANSIENT_ERROR_TOKENS),
+        question_prefix=marker_matcher(QUESTION_PREFIXES),
+        project_context=marker_matcher(PROJECT_CONTEXT_TOKENS),
+        project_implementation=marker_matcher(PROJECT_IMPLEMENTATION_TOKENS),
+        global_scope=marker_matcher(GLOBAL_SCOPE_TOKENS),
+        vault_context=marker_matcher(VAULT_CONTEXT_TOKENS),
+    )
+
+
+def char_shingles(value: str) -> frozenset[str]:
+    value = " ".join(value.lower().split()).strip(" .!?*-")
+    if len(value) <= SHINGLE_SIZE:
+        return frozenset({value}) if value else frozenset()
+    return frozenset(value[index : index + SHINGLE_SIZE] for index in range(len(value) - SHINGLE_SIZE + 1))
+
+
+def build_shingle_index(segments: Iterable[str]) -> tuple[dict[str, tuple[int, ...]], tuple[int, ...]]:
+    postings: dict[str, list[int]] = defaultdict(list)
+    sizes: list[int] = []
+    for segment_id, segment in enumerate(segments):
+        shingles = char_shingles(segment)
+        sizes.append(len(shingles))
+        for shingle in shingles:
+            postings[shingle].append(segment_id)
+    return {shingle: tuple(ids) for shingle, ids in postings.items()}, tuple(sizes)
+
+
+def word_shingles(value: str) -> frozenset[str]:
+    words = re.findall(r"[a-z0-9]+", value.lower())
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(f"{left} {right}" for left, right in zip(words, words[1:]))
+
+
+@lru_cache(maxsize=SHINGLE_HASH_MEMO_SIZE)
+def shingle_hashes(shingle: str) -> tuple[int, ...]:
+    import hashlib
+    import struct
+
+    # Each salted 64-byte blake2b digest yields 16 independent 32-bit hash values.
+    data = shingle.encode("utf-8")
+    return tuple(
+        value
+        for salt in MINHASH_SALTS
+        for value in struct.unpack("<16I", hashlib.blake2b(data, digest_size=64, person=salt).digest())
+    )
+
+
+def minhash_signature(shingles: frozenset[str]) -> tuple[int, ...]:
+    return tuple(map(min, zip(*map(shingle_hashes, shingles))))
+
+
+def jaccard(left: frozenset[str], right: frozenset[str]) -> float:
+    if not left or not right:
+        return 0.0
+    overlap = len(left & right)
+    return overlap / (len(left) + len(right) - overlap)
+
+
+def near_duplicate_clusters(texts: list[str], scopes: list[Any]) -> list[list[int]]:
+    # Leader clustering over MinHash + banded LSH: each text joins the most similar
+    # earlier leader in its scope, found only through colliding signature bands, or
+    # becomes a leader itself. Comparing against leaders rather than any member keeps
+    # clusters from chaining, and bounded bucket probes keep the pass linear.
+    leaders = list(range(len(texts)))
+    shingles = [word_shingles(text) for text in texts]
+    rows = len(MINHASH_SALTS) * 16 // LSH_BANDS
+    exact: dict[tuple[Any, frozenset[str]], int] = {}
+    buckets: dict[tuple[Any, int, tuple[int, ...]], list[int]] = defaultdict(list)
+    for index, item_shingles in enumerate(shingles):
+        if not item_shingles:
+            continue
+        first = exact.setdefault((scopes[index], item_shingles), index)
+        if first != index:
+            leaders[index] = leaders[first]
+            continue
+        signature = minhash_signature(item_shingles)
+        keys = [(scopes[index], band, signature[band * rows : (band + 1) * rows]) for band in range(LSH_BANDS)]
+        candidates = {leader for key in keys for leader in buckets.get(key, ())[:LSH_BUCKET_PROBES]}
+        best, best_score = index, NEAR_DUPLICATE_JACCARD
+        for leader in sorted(candidates):
+            score = jaccard(item_shingles, shingles[leader])
+            if score > best_score or (score == best_score and best == index):
+                best, best_score = leader, score
+        if best == index:
+            for key in keys:
+                buckets[key].append(index)
+        leaders[index] = best
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for index, leader in enumerate(leaders):
+        clusters[leader].append(index)
+    return list(clusters.values())
+
+
+def merge_near_duplicate_proposals(proposals: list[Proposal]) -> list[Proposal]:
+    merged: list[Proposal] = []
+    clusters = near_duplicate_clusters(
+        [proposal.suggestion for proposal in proposals],
+        [(proposal.bucket, proposal.target) for proposal in proposals],
+    )
+    for members in sorted(clusters):
+        if len(members) == 1:
+            merged.append(proposals[members[0]])
+            continue
+        # The best-supported phrasing names the cluster; ties go to the one seen first.
+        lead = proposals[min(members, key=lambda index: (-proposals[index].support, index))]
+        combined = Proposal(bucket=lead.bucket, target=lead.target, suggestion=lead.suggestion)
+        evidence = [item for index in members for item in proposals[index].evidence]
+        for item in sorted(evidence, key=lambda item: (item.updated_at, item.thread_id), reverse=True):
+            combined.add_evidence(item)
+        merged.append(combined)
+    return merged
+
+
+def thread_cluster_key(thread: ThreadRecord, target: str) -> str:
+    day = datetime.fromtimestamp(thread.updated_at, tz=timezone.utc).strftime("%Y-%m-%d")
+    title_key = normalize_token_key(thread.title) or normalize_token_key(thread.cwd) or thread.thread_id
+    return f"{target}::{title_key}::{day}"
+
+
+@lru_cache(maxsize=1)
+def known_repo_roots() -> tuple[Path, ...]:
+    roots: list[Path] = []
+    vault_root = Path.home() / "vault"
+    if vault_root.exists():
+        roots.append(vault_root)
+
+    for search_root in REPO_SEARCH_ROOTS:
+        roots.extend(search_root / name for name in listed_repo_dirs(search_root))
+    return tuple(roots)
+
+
+def listed_repo_dirs(search_root: Path) -> list[str]:
+    import json
+
+    try:
+        mtime_ns = search_root.stat().st_mtime_ns
+    except OSError:
+        return []
+    if not search_root.is_dir():
+        return []
+
+    # Adding or removing a repo bumps the search root's mtime, which invalidates the listing.
+    conn = open_index()
+    row = conn.execute("SELECT mtime_ns, names FROM repo_roots WHERE search_root = ?", (str(search_root),)).fetchone()
+    if row and row[0] == mtime_ns:
+        return json.loads(row[1])
+    names = sorted(child.name for child in search_root.iterdir() if child.is_dir())
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO repo_roots (search_root, mtime_ns, names) VALUES (?, ?, ?)",
+            (str(search_root), mtime_ns, json.dumps(names)),
+        )
+    return names
+
+
+@lru_cache(maxsize=None)
+def resolve_repo_root_name(repo_name: str, fallback: Path) -> Path:
+    import difflib
+
+    candidates = known_repo_roots()
+    if not candidates:
+        return fallback
+
+    exact = next((candidate for candidate in candidates if candidate.name == repo_name), None)
+    if exact is not None:
+        return exact
+
+    best_candidate = fallback
+    best_score = 0.0
+    for candidate in candidates:
+        score = difflib.SequenceMatcher(None, repo_name, candidate.name).ratio()
+        if candidate.name.endswith(repo_name) or repo_name.endswith(candidate.name):
+            score += 0.15
+        repo_tokens = set(repo_name.split("-"))
+        candidate_tokens = set(candidate.name.split("-"))
+        if repo_tokens and candidate_tokens:
+            score += 0.10 * (len(repo_tokens & candidate_tokens) / len(repo_tokens | candidate_tokens))
+        if score > best_score:
+            best_score = score
+            best_candidate = candidate
+
+    if best_score >= 0.74:
+        return best_candidate
+
+    matches = difflib.get_close_matches(
+        repo_name,
+        [candidate.name for candidate in candidates],
+        n=1,
+        cutoff=0.74,
+    )
+    if matches:
+        return next(candidate for candidate in candidates if candidate.name == matches[0])
+    return fallback
+
+
+def days_cutoff(days: int) -> int:
+    return int((datetime.now(tz=timezone.utc) - timedelta(days=days)).timestamp())
+
+
+def thread_filters(
+    *,
+    archived: str,
+    cwd_prefix: str | None = None,
+    source_query: str | None = None,
+    model_query: str | None = None,
+    days: int | None = None,
+    top_level_only: bool = False,
+    since: tuple[int, str] | None = None,
+) -> tuple[list[str], list[Any]]:
+    where = []
+    params: list[Any] = []
+
+    if archived == "active":
+        where.append("archived = 0")
+    elif archived == "archived":
+        where.append("archived = 1")
+    elif archived != "all":
+        raise SystemExit("--archived must be one of active, archived, all")
+
+    if cwd_prefix:
+        where.append("cwd LIKE ?")
+        params.append(f"{cwd_prefix}%")
+    if source_query:
+        where.append("source LIKE ?")
+        params.append(f"%{source_query}%")
+    if model_query:
+        where.append("coalesce(model, '') LIKE ?")
+        params.append(f"%{model_query}%")
+    if days:
+        where.append("updated_at >= ?")
+        params.append(days_cutoff(days))
+    if since:
+        where.append("(updated_at > ? OR (updated_at = ? AND id > ?))")
+        params.extend([since[0], since[0], since[1]])
+    if top_level_only:
+        where.append("source IN ('vscode', 'cli', 'exec')")
+        where.append("(agent_role IS NULL OR agent_role = '')")
+        where.append("title NOT LIKE 'Automation:%'")
+    return where, params
+
+
+def thread_where(db_path: Path, *, text_query: str | None = None, **filters: Any) -> tuple[list[str], list[Any]]:
+    import json
+
+    where, params = thread_filters(**filters)
+    if text_query:
+        # Answer the query from the sidecar FTS index before LIMIT is applied.
+        sync_search_index(db_path, where, params)
+        where.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(search_thread_ids(text_query)))
+    return where, params
+
+
+def where_clause(where: list[str]) -> str:
+    return f"WHERE {' AND '.join(where)}" if where else ""
+
+
+@lru_cache(maxsize=None)
+def open_state_db(db_path: Path) -> sqlite3.Connection:
+    # Codex owns state_5.sqlite: open it read-only so WAL readers never take a write lock on it.
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=STATE_BUSY_TIMEOUT)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA mmap_size={STATE_MMAP_SIZE}")
+    return conn
+
+
+def state_rows(db_path: Path, sql: str, params: Iterable[Any] = ()) -> Iterable[tuple[Any, ...]]:
+    params = tuple(params)
+    for attempt in range(STATE_BUSY_RETRIES + 1):
+        try:
+            cursor = open_state_db(db_path).execute(sql, params)
+            break
+        except sqlite3.OperationalError as exc:
+            message = str(exc)
+            if attempt == STATE_BUSY_RETRIES or not ("locked" in message or "busy" in message):
+                raise
+            time.sleep(0.05 * 2**attempt)
+    # Rows are pulled from the cursor as the caller iterates, never fetched all at once.
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+@profiled("fetch_threads")
+def fetch_threads(db_path: Path, **filters: Any) -> list[ThreadRecord]:
+    return list(iter_threads(db_path, **filters))
+
+
+def iter_threads(
+    db_path: Path,
+    *,
+    limit: int | None,
+    archived: str,
+    cwd_prefix: str | None = None,
+    source_query: str | None = None,
+    model_query: str | None = None,
+    text_query: str | None = None,
+    days: int | None = None,
+    top_level_only: bool = False,
+    since: tuple[int, str] | None = None,
+) -> Iterable[ThreadRecord]:
+    require_db(db_path)
+    where, params = thread_where(
+        db_path,
+        archived=archived,
+        cwd_prefix=cwd_prefix,
+        source_query=source_query,
+        model_query=model_query,
+        text_query=text_query,
+        days=days,
+        top_level_only=top_level_only,
+        since=since,
+    )
+    sql = f"""
+        SELECT
+            id,
+            title,
+            source,
+            cwd,
+            created_at,
+            updated_at,
+            archived,
+            coalesce(model, ''),
+            coalesce(reasoning_effort, ''),
+            rollout_path,
+            coalesce(agent_role, ''),
+            coalesce(agent_nickname, '')
+        FROM threads
+        {where_clause(where)}
+        ORDER BY updated_at DESC, id DESC
+        LIMIT ?
+    """
+    params.append(-1 if limit is None else limit)
+
+    for row in state_rows(db_path, sql, params):
+        yield thread_record(row)
+
+
+def fetch_thread_by_id(db_path: Path, thread_id: str) -> ThreadRecord | None:
+    require_db(db_path)
+    rows = state_rows(
+        db_path,
+        """
+        SELECT
+            id, title, source, cwd, created_at, updated_at, archived,
+            coalesce(model, ''), coalesce(reasoning_effort, ''),
+            rollout_path, coalesce(agent_role, ''), coalesce(agent_nickname, '')
+        FROM threads
+        WHERE id = ?
+        """,
+        (thread_id,),
+    )
+    row = next(rows, None)
+    rows.close()
+    return thread_record(row) if row else None
+
+
+def thread_record(row: tuple[Any, ...]) -> ThreadRecord:
+    return ThreadRecord(
+        thread_id=row[0],
+        title=row[1] or "",
+        source=row[2] or "",
+        cwd=row[3] or "",
+        created_at=int(row[4]),
+        updated_at=int(row[5]),
+        archived=bool(row[6]),
+        model=row[7] or "",
+        reasoning_effort=row[8] or "",
+        rollout_path=row[9] or "",
+        agent_role=row[10] or "",
+        agent_nickname=row[11] or "",
+    )
+
+
+def like_escape(value: str) -> str:
+    # Pairs with `LIKE ? ESCAPE '\'`; paths and thread ids may contain _ and %.
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def forget_rollout_dir(conn: sqlite3.Connection, directory: str) -> None:
+    subtree = f"{like_escape(directory + os.sep)}%"
+    conn.execute("DELETE FROM rollout_dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (directory, subtree))
+    conn.execute("DELETE FROM rollout_files WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (directory, subtree))
+
+
+@profiled("refresh_rollout_paths")
+def refresh_rollout_paths(*, full: bool = False) -> ReindexStats:
+    conn = open_index()
+    stats = ReindexStats()
+    with conn:
+        if full:
+            conn.execute("DELETE FROM rollout_dirs")
+            conn.execute("DELETE FROM rollout_files")
+        known: dict[str, int] = {}
+        children: dict[str, list[str]] = defaultdict(list)
+        for path, parent, mtime_ns in conn.execute("SELECT path, parent, mtime_ns FROM rollout_dirs"):
+            known[path] = mtime_ns
+            children[parent].append(path)
+
+        # A directory's mtime only changes when its own entries change, so unchanged
+        # directories are descended through their stored children without listing them.
+        pending = [(str(root), "") for root in ROLLOUT_ROOTS]
+        while pending:
+            directory, parent = pending.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                forget_rollout_dir(conn, directory)
+                continue
+            stats.directories += 1
+            if known.get(directory) == mtime_ns:
+                pending.extend((child, directory) for child in children[directory])
+                continue
+
+            stats.rescanned += 1
+            subdirs: list[str] = []
+            files: list[tuple[str, str, str]] = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    match = ROLLOUT_NAME_RE.match(entry.name)
+                    if match:
+                        files.append((entry.path, directory, match["thread_id"]))
+            for stale in set(children[directory]) - set(subdirs):
+                forget_rollout_dir(conn, stale)
+            conn.execute("DELETE FROM rollout_files WHERE dir = ?", (directory,))
+            conn.executemany("INSERT OR REPLACE INTO rollout_files (path, dir, thread_id) VALUES (?, ?, ?)", files)
+            conn.execute(
+                "INSERT OR REPLACE INTO rollout_dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                (directory, parent, mtime_ns),
+            )
+            pending.extend((child, directory) for child in subdirs)
+
+        stats.rollouts = conn.execute("SELECT count(*) FROM rollout_files").fetchone()[0]
+    return stats
+
+
+@lru_cache(maxsize=1)
+def ensure_rollout_paths() -> ReindexStats:
+    return refresh_rollout_paths()
+
+
+def find_orphan_rollout(thread_id: str) -> Path | None:
+    ensure_rollout_paths()
+    conn = open_index()
+    rows = conn.execute("SELECT path FROM rollout_files WHERE thread_id = ?", (thread_id,)).fetchall()
+    if not rows:
+        rows = conn.execute(
+            "SELECT path FROM rollout_files WHERE path LIKE ? ESCAPE '\\'",
+            (f"%{like_escape(thread_id)}.jsonl%",),
+        ).fetchall()
+    roots = [str(root) for root in ROLLOUT_ROOTS]
+    for (path,) in sorted(rows, key=lambda row: (not row[0].startswith(roots[0]), row[0])):
+        candidate = Path(path)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def moved_rollout_path(rollout_path: str) -> Path | None:
+    row = open_index().execute("SELECT path FROM rollout_moves WHERE original = ?", (rollout_path,)).fetchone()
+    if row and os.path.exists(row[0]):
+        return Path(row[0])
+    # Survives a deleted sidecar: compressed copies keep the original name plus a suffix.
+    for _, suffix in ROLLOUT_CODECS.values():
+        if rollout_path and os.path.exists(rollout_path + suffix):
+            return Path(rollout_path + suffix)
+    return None
+
+
+def zstandard_module() -> Any:
+    try:
+        return importlib.import_module("zstandard")
+    except ImportError as exc:
+        raise SystemExit("Reading or writing .zst rollouts needs the zstandard package") from exc
+
+
+def rollout_codec(handle: IO[bytes]) -> str | None:
+    magic = handle.read(4)
+    handle.seek(0)
+    for codec, (prefix, _) in ROLLOUT_CODECS.items():
+        if magic.startswith(prefix):
+            return codec
+    return None
+
+
+def open_rollout(path: Path) -> IO[bytes]:
+    # Format comes from the magic bytes, not the suffix, so renamed files still decode.
+    handle = path.open("rb")
+    codec = rollout_codec(handle)
+    if codec is None:
+        return handle
+    # Reopen by path so closing the decompressor also closes the file; a
+    # GzipFile built on fileobj= leaves it open.
+    handle.close()
+    if codec == "gzip":
+        import gzip
+
+        return gzip.open(path, "rb")
+    return io.BufferedReader(zstandard_module().open(path, "rb"))
+
+
+@lru_cache(maxsize=None)
+def json_decoder(backend: str | None = None) -> tuple[str, Callable[[bytes | str], Any]]:
+    import json
+
+    requested = backend or os.environ.get("SELF_IMPROVE_JSON")
+    if requested and requested not in JSON_BACKENDS:
+        raise SystemExit(f"Unknown JSON backend {requested!r}; expected one of {', '.join(JSON_BACKENDS)}")
+    for name in (requested,) if requested else JSON_BACKENDS:
+        if name == "json":
+            return name, json.loads
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            if requested:
+                raise SystemExit(f"JSON backend {name!r} is not installed")
+            continue
+        return name, module.loads if name == "orjson" else module.json.decode
+    return "json", json.loads
+
+
+def decode_json(data: bytes | str) -> Any:
+    # Every backend raises a ValueError subclass on malformed input.
+    return json_decoder()[1](data)
+
+
+def rollout_event(event: dict[str, Any]) -> RolloutEvent | None:
+    event_type = event.get("type")
+    payload = event.get("payload") or {}
+    if event_type == "session_meta":
+        return SessionMeta(thread_id=payload.get("id") or "", cwd=payload.get("cwd") or "", payload=payload)
+    if event_type == "event_msg":
+        return EventMsg(
+            kind=payload.get("type") or "",
+            message=(payload.get("message") or "").strip(),
+            phase=payload.get("phase") or "",
+        )
+    if event_type != "response_item":
+        return None
+
+    payload_type = payload.get("type")
+    if payload_type == "message":
+        return ResponseMessage(role=payload.get("role") or "unknown", content=tuple(payload.get("content") or ()))
+    if payload_type == "function_call":
+        return FunctionCall(
+            name=payload.get("name") or "unknown_tool",
+            arguments=str(payload.get("arguments") or ""),
+            call_id=payload.get("call_id") or "",
+        )
+    if payload_type == "function_call_output":
+        return FunctionCallOutput(call_id=payload.get("call_id") or "unknown", output=str(payload.get("output") or ""))
+    return None
+
+
+def iter_rollout_events(path: Path) -> Iterable[dict[str, Any]]:
+    COUNTERS["rollout.bytes_read"] += path.stat().st_size
+    with open_rollout(path) as handle:
+        for line_no, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield decode_json(line)
+            except ValueError as exc:
+                raise SystemExit(f"Bad JSON in {path}:{line_no}: {exc}") from exc
+
+
+def iter_followed_events(
+    path: Path,
+    *,
+    interval: float,
+    polls: int | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterable[list[RolloutEvent]]:
+    # Each poll reads only bytes appended since the last one. A trailing line without
+    # its newline is held back until the writer finishes it, unless it already parses.
+    with path.open("rb") as handle:
+        if rollout_codec(handle) is not None:
+            raise SystemExit(f"--follow needs a plain .jsonl rollout: {path}")
+    offset, pending, line_no = 0, b"", 0
+    while True:
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        if size < offset:
+            offset, pending = 0, b""
+        if size > offset:
+            with path.open("rb") as handle:
+                handle.seek(offset)
+                while chunk := handle.read(min(FOLLOW_CHUNK_SIZE, size - offset)):
+                    offset += len(chunk)
+                    COUNTERS["rollout.bytes_read"] += len(chunk)
+                    lines = (pending + chunk).split(b"\n")
+                    pending = lines.pop()
+                    events = []
+                    for line in lines:
+                        line_no += 1
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            typed = rollout_event(decode_json(line))
+                        except ValueError as exc:
+                            raise SystemExit(f"Bad JSON in {path}:{line_no}: {exc}") from exc
+                        if typed is not None:
+                            events.append(typed)
+                    if pending.strip() and offset >= size:
+                        try:
+                            typed = rollout_event(decode_json(pending))
+                        except ValueError:
+                            typed = None
+                        else:
+                            line_no += 1
+                            pending = b""
+                        if typed is not None:
+                            events.append(typed)
+                    if events:
+                        yield events
+        if polls is not None:
+            polls -= 1
+            if polls < 0:
+                return
+        sleep(interval)
+
+
+def iter_typed_rollout_events(path: Path) -> Iterable[RolloutEvent]:
+    for event in iter_rollout_events(path):
+        typed = rollout_event(event)
+        if typed is not None:
+            yield typed
+
+
+@lru_cache(maxsize=1)
+def open_index() -> sqlite3.Connection:
+    INDEX_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDEX_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(INDEX_SCHEMA)
+    try:
+        conn.executescript(THREAD_SEARCH_FTS)
+    except sqlite3.OperationalError:
+        # No FTS5 or no trigram tokenizer (SQLite < 3.34): same columns in a plain
+        # table, and search_thread_ids answers every query with a LIKE scan.
+        conn.executescript(THREAD_SEARCH_PLAIN)
+    return conn
+
+
+def thread_search_is_fts(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'thread_search'").fetchone()
+    return bool(row) and "fts5" in row[0].lower()
+
+
+def iter_marked_rollout_events(
+    path: Path,
+    marker: bytes,
+    stats: RolloutScanStats | None = None,
+) -> Iterable[dict[str, Any]]:
+    import mmap
+
+    stats = stats if stats is not None else RolloutScanStats()
+    stats.files += 1
+    with path.open("rb") as handle:
+        if rollout_codec(handle) is not None:
+            handle.close()
+            yield from iter_marked_stream_events(path, marker, stats)
+            return
+        try:
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return
+        with data:
+            size = len(data)
+            start = 0
+            while start < size:
+                hit = data.find(marker, start)
+                if hit == -1:
+                    stats.bytes_skipped += size - start
+                    return
+                line_start = data.rfind(b"\n", start, hit) + 1 or start
+                line_end = data.find(b"\n", hit)
+                if line_end == -1:
+                    line_end = size
+                stats.bytes_skipped += line_start - start
+                stats.bytes_decoded += min(line_end + 1, size) - line_start
+                try:
+                    event = decode_json(data[line_start:line_end])
+                except ValueError as exc:
+                    raise SystemExit(f"Bad JSON in {path} at byte {line_start}: {exc}") from exc
+                stats.events_decoded += 1
+                start = line_end + 1
+                yield event
+
+
+def iter_marked_stream_events(path: Path, marker: bytes, stats: RolloutScanStats) -> Iterable[dict[str, Any]]:
+    # Compressed rollouts cannot be mapped, but unmarked lines still skip decoding.
+    with open_rollout(path) as handle:
+        for line_no, line in enumerate(handle, start=1):
+            if marker not in line:
+                stats.bytes_skipped += len(line)
+                continue
+            stats.bytes_decoded += len(line)
+            try:
+                event = decode_json(line)
+            except ValueError as exc:
+                raise SystemExit(f"Bad JSON in {path}:{line_no}: {exc}") from exc
+            stats.events_decoded += 1
+            yield event
+
+
+def read_user_messages(path: Path) -> list[str]:
+    messages: list[str] = []
+    stats = RolloutScanStats()
+    for event in iter_marked_rollout_events(path, USER_MESSAGE_MARKER, stats):
+        if event.get("type") != "event_msg":
+            continue
+        payload = event.get("payload") or {}
+        if payload.get("type") != "user_message":
+            continue
+        message = (payload.get("message") or "").strip()
+        if message:
+            messages.append(message)
+    count_rollout_scan(stats)
+    return messages
+
+
+def count_rollout_scan(stats: RolloutScanStats) -> None:
+    COUNTERS["rollout.files_scanned"] += stats.files
+    COUNTERS["rollout.bytes_skipped"] += stats.bytes_skipped
+    COUNTERS["rollout.bytes_decoded"] += stats.bytes_decoded
+    COUNTERS["rollout.events_decoded"] += stats.events_decoded
+
+
+@lru_cache(maxsize=4096)
+def indexed_user_messages(rollout_path: str, size: int, mtime_ns: int) -> tuple[str, ...]:
+    import json
+
+    conn = open_index()
+    row = conn.execute(
+        "SELECT size, mtime_ns, messages FROM rollout_messages WHERE rollout_path = ?",
+        (rollout_path,),
+    ).fetchone()
+    if row and row[0] == size and row[1] == mtime_ns:
+        COUNTERS["cache.rollout_messages.hits"] += 1
+        return tuple(decode_json(row[2]))
+
+    COUNTERS["cache.rollout_messages.misses"] += 1
+    messages = read_user_messages(Path(rollout_path))
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO rollout_messages (rollout_path, size, mtime_ns, messages) VALUES (?, ?, ?, ?)",
+            (rollout_path, size, mtime_ns, json.dumps(messages)),
+        )
+    return tuple(messages)
+
+
+def rollout_user_messages(rollout_path: str) -> tuple[str, ...]:
+    path = Path(rollout_path)
+    try:
+        stat = path.stat()
+    except OSError:
+        path = moved_rollout_path(rollout_path)
+        if path is None:
+            return ()
+        stat = path.stat()
+    return indexed_user_messages(str(path), stat.st_size, stat.st_mtime_ns)
+
+
+@profiled("collect_user_messages")
+def collect_user_messages(thread: ThreadRecord) -> list[str]:
+    return list(rollout_user_messages(thread.rollout_path))
+
+
+@profiled("sync_search_index")
+def sync_search_index(db_path: Path, where: list[str], params: list[Any]) -> None:
+    conn = open_index()
+    indexed = {
+        thread_id: (row_id, updated_at)
+        for row_id, thread_id, updated_at in conn.execute("SELECT id, thread_id, updated_at FROM thread_search_state")
+    }
+    rows = state_rows(
+        db_path,
+        f"""
+        SELECT id, coalesce(title, ''), coalesce(cwd, ''), coalesce(first_user_message, ''),
+               updated_at, coalesce(rollout_path, '')
+        FROM threads
+        {where_clause(where)}
+        """,
+        params,
+    )
+
+    with conn:
+        for thread_id, title, cwd, first_user_message, updated_at, rollout_path in rows:
+            row_id, indexed_at = indexed.get(thread_id, (None, None))
+            if indexed_at == updated_at:
+                continue
+            if row_id is None:
+                row_id = conn.execute(
+                    "INSERT INTO thread_search_state (thread_id, updated_at) VALUES (?, ?)",
+                    (thread_id, updated_at),
+                ).lastrowid
+            else:
+                conn.execute("UPDATE thread_search_state SET updated_at = ? WHERE id = ?", (updated_at, row_id))
+                conn.execute("DELETE FROM thread_search WHERE rowid = ?", (row_id,))
+            conn.execute(
+                "INSERT INTO thread_search (rowid, title, cwd, first_user_message, messages) VALUES (?, ?, ?, ?, ?)",
+                (row_id, title, cwd, first_user_message, "\n".join(rollout_user_messages(rollout_path))),
+            )
+
+
+def search_thread_ids(query: str) -> list[str]:
+    conn = open_index()
+    if len(query) >= 3 and thread_search_is_fts(conn):
+        # Trigram phrases match substrings, same as the old `needle in haystack` scan.
+        phrase = '"' + query.replace('"', '""') + '"'
+        rows = conn.execute(
+            """
+            SELECT s.thread_id FROM thread_search
+            JOIN thread_search_state s ON s.id = thread_search.rowid
+            WHERE thread_search MATCH ?
+            """,
+            (phrase,),
+        )
+    else:
+        pattern = f"%{like_escape(query)}%"
+        rows = conn.execute(
+            """
+            SELECT s.thread_id FROM thread_search
+            JOIN thread_search_state s ON s.id = thread_search.rowid
+            WHERE title LIKE ?1 ESCAPE '\\' OR cwd LIKE ?1 ESCAPE '\\'
+               OR first_user_message LIKE ?1 ESCAPE '\\' OR messages LIKE ?1 ESCAPE '\\'
+            """,
+            (pattern,),
+        )
+    return [row[0] for row in rows]
+
+
+def extract_message_text(payload: dict[str, Any]) -> str:
+    content = payload.get("content") or []
+    chunks: list[str] = []
+    for item in content:
+        if isinstance(item, dict):
+            text = item.get("text")
+            if text:
+                chunks.append(str(text))
+    return "\n".join(chunks).strip()
+
+
+@profiled("emit_threads_table")
+def print_threads_table(rows: list[ThreadRecord]) -> None:
+    print("Updated UTC         St Source            Model           CWD                              Title                            Thread")
+    print("------------------- -- ----------------- --------------- -------------------------------- -------------------------------- ------------------------------------")
+    for row in rows:
+        state = "AR" if row.archived else "AC"
+        source = normalize_source(row.source)
+        print(
+            f"{to_utc(row.updated_at):<19} "
+            f"{state:<2} "
+            f"{shorten(source, 17):<17} "
+            f"{shorten(row.model, 15):<15} "
+            f"{shorten(row.cwd, 32):<32} "
+            f"{shorten(row.title, 32):<32} "
+            f"{row.thread_id}"
+        )
+
+
+def cmd_list(args: argparse.Namespace) -> None:
+    rows = fetch_threads(
+        STATE_DB,
+        limit=args.limit,
+        archived=args.archived,
+        cwd_prefix=args.cwd,
+        source_query=args.source,
+        model_query=args.model,
+        text_query=args.query,
+        days=args.days,
+        top_level_only=args.top_level_only,
+    )
+    print_threads_table(rows)
+
+
+def thread_rollout_path(thread: ThreadRecord) -> Path:
+    return resolve_rollout_path(thread.thread_id, thread.rollout_path)
+
+
+def resolve_rollout_path(thread_id: str, recorded_path: str) -> Path:
+    rollout_path = Path(recorded_path)
+    if not rollout_path.exists():
+        fallback = moved_rollout_path(recorded_path) or find_orphan_rollout(thread_id)
+        if fallback is not None:
+            rollout_path = fallback
+    return rollout_path
+
+
+@profiled("emit_transcript")
+def render_transcript(
+    thread: ThreadRecord,
+    *,
+    max_tool_chars: int,
+    include_instructions: bool,
+    follow: bool = False,
+    interval: float = 1.0,
+    out: IO[str] | None = None,
+) -> None:
+    out = sys.stdout if out is None else out
+    rollout_path = thread_rollout_path(thread)
+
+    print(f"# {thread.title or thread.thread_id}", file=out)
+    print(file=out)
+    print(f"- thread_id: `{thread.thread_id}`", file=out)
+    print(f"- updated_at: `{to_utc(thread.updated_at)}`", file=out)
+    print(f"- created_at: `{to_utc(thread.created_at)}`", file=out)
+    print(f"- source: `{normalize_source(thread.source)}`", file=out)
+    print(f"- model: `{thread.model}`", file=out)
+    print(f"- reasoning_effort: `{thread.reasoning_effort}`", file=out)
+    print(f"- archived: `{int(thread.archived)}`", file=out)
+    print(f"- cwd: `{thread.cwd}`", file=out)
+    print(f"- rollout_path: `{rollout_path}`", file=out)
+    print(file=out)
+
+    if not follow:
+        for event in iter_typed_rollout_events(rollout_path):
+            render_event(event, max_tool_chars=max_tool_chars, include_instructions=include_instructions, out=out)
+        return
+
+    try:
+        for events in iter_followed_events(rollout_path, interval=interval):
+            for event in events:
+                render_event(event, max_tool_chars=max_tool_chars, include_instructions=include_instructions, out=out)
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def render_event(event: RolloutEvent, *, max_tool_chars: int, include_instructions: bool, out: IO[str]) -> None:
+    if isinstance(event, EventMsg):
+        if event.kind == "user_message":
+            if event.message:
+                print("## User", file=out)
+                print(file=out)
+                print(event.message, file=out)
+                print(file=out)
+        elif event.kind == "agent_message":
+            if event.message:
+                print(f"## Assistant ({event.phase or 'assistant'})", file=out)
+                print(file=out)
+                print(event.message, file=out)
+                print(file=out)
+        elif event.kind == "task_started":
+            print("## Task Started", file=out)
+            print(file=out)
+        elif event.kind == "task_complete":
+            print("## Task Complete", file=out)
+            print(file=out)
+    elif isinstance(event, ResponseMessage):
+        if not include_instructions or event.role not in {"developer", "system"}:
+            return
+        text = event.text
+        if text:
+            print(f"## {event.role.title()} Instructions", file=out)
+            print(file=out)
+            print(text, file=out)
+            print(file=out)
+    elif isinstance(event, FunctionCall):
+        print(f"## Tool Call: {event.name}", file=out)
+        print(file=out)
+        print("```json", file=out)
+        print(shorten(event.arguments, max_tool_chars), file=out)
+        print("```", file=out)
+        print(file=out)
+    elif isinstance(event, FunctionCallOutput):
+        print(f"## Tool Output: {event.call_id}", file=out)
+        print(file=out)
+        print("```text", file=out)
+        print(shorten(event.output, max_tool_chars), file=out)
+        print("```", file=out)
+        print(file=out)
+
+
+def cmd_show(args: argparse.Namespace) -> None:
+    import json
+
+    thread = fetch_thread_by_id(STATE_DB, args.thread_id)
+    if thread is None:
+        orphan = find_orphan_rollout(args.thread_id)
+        if orphan is None:
+            raise SystemExit(f"No thread found for {args.thread_id}")
+        print(f"# Orphan Rollout {args.thread_id}")
+        print()
+        print(f"- rollout_path: `{orphan}`")
+        print()
+        for event in iter_typed_rollout_events(orphan):
+            if isinstance(event, SessionMeta):
+                print("```json")
+                print(json.dumps(event.payload, indent=2, sort_keys=True))
+                print("```")
+                return
+        return
+
+    render_transcript(
+        thread,
+        max_tool_chars=args.max_tool_chars,
+        include_instructions=args.include_instructions,
+        follow=args.follow,
+        interval=args.interval,
+    )
+
+
+def rollout_event_record(event: RolloutEvent) -> dict[str, Any]:
+    record = {"type": ROLLOUT_EVENT_KINDS[type(event)], **asdict(event)}
+    if isinstance(event, ResponseMessage):
+        record["text"] = event.text
+    return record
+
+
+def export_thread(
+    thread: ThreadRecord,
+    *,
+    out_dir: Path,
+    fmt: str,
+    max_tool_chars: int,
+    include_instructions: bool,
+) -> tuple[str, int, str]:
+    import json
+
+    target = out_dir / f"{EXPORT_NAME_RE.sub('_', thread.thread_id)}.{fmt}"
+    try:
+        with target.open("w", encoding="utf-8", buffering=EXPORT_BUFFER_SIZE) as out:
+            if fmt == "md":
+                render_transcript(thread, max_tool_chars=max_tool_chars, include_instructions=include_instructions, out=out)
+            else:
+                out.write(json.dumps({"type": "thread", **asdict(thread)}, ensure_ascii=False) + "\n")
+                for event in iter_typed_rollout_events(thread_rollout_path(thread)):
+                    out.write(json.dumps(rollout_event_record(event), ensure_ascii=False) + "\n")
+    except (OSError, SystemExit) as exc:
+        # One unreadable rollout should not abort a batch of hundreds.
+        target.unlink(missing_ok=True)
+        return thread.thread_id, 0, str(exc)
+    return thread.thread_id, target.stat().st_size, ""
+
+
+def cmd_export(args: argparse.Namespace) -> None:
+    rows = fetch_threads(
+        STATE_DB,
+        limit=args.limit,
+        archived=args.archived,
+        cwd_prefix=args.cwd,
+        source_query=args.source,
+        model_query=args.model,
+        text_query=args.query,
+        days=args.days,
+        top_level_only=args.top_level_only,
+    )
+    out_dir = args.out.expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    export = partial(
+        export_thread,
+        out_dir=out_dir,
+        fmt=args.format,
+        max_tool_chars=args.max_tool_chars,
+        include_instructions=args.include_instructions,
+    )
+
+    jobs = min(resolve_jobs(args.jobs), len(rows))
+    if jobs <= 1:
+        results = [export(thread) for thread in rows]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(rows) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=reset_worker_state, initargs=(PROFILER.enabled,)) as pool:
+            results = list(pool.map(export, rows, chunksize=chunksize))
+
+    written = 0
+    exported = 0
+    for thread_id, size, error in results:
+        if error:
+            print(f"Skipped {thread_id}: {error}", file=sys.stderr)
+            continue
+        exported += 1
+        written += size
+    print(f"Exported {exported} of {len(rows)} thread(s) to {out_dir} ({written / 1e6:.1f} MB).")
+
+
+def event_time(value: Any) -> float | None:
+    if not isinstance(value, str):
+        return None
+    # Codex writes "...Z"; fromisoformat only accepts that suffix from Python 3.11 on.
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+@profiled("tool_call_latencies")
+def tool_call_latencies(thread: ThreadRecord) -> tuple[list[tuple[str, float]], int]:
+    rollout_path = thread_rollout_path(thread)
+    if not rollout_path.exists():
+        return [], 0
+    pending: dict[str, tuple[str, float]] = {}
+    latencies: list[tuple[str, float]] = []
+    stats = RolloutScanStats()
+    # Only function_call / function_call_output lines are decoded; everything else is skipped unparsed.
+    for event in iter_marked_rollout_events(rollout_path, TOOL_CALL_MARKER, stats):
+        stamp = event_time(event.get("timestamp"))
+        if stamp is None:
+            continue
+        typed = rollout_event(event)
+        if isinstance(typed, FunctionCall):
+            pending[typed.call_id] = (typed.name, stamp)
+        elif isinstance(typed, FunctionCallOutput) and typed.call_id in pending:
+            name, started = pending.pop(typed.call_id)
+            latencies.append((name, max(stamp - started, 0.0)))
+    count_rollout_scan(stats)
+    return latencies, len(pending)
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    # Nearest-rank, so every reported value is a duration that actually happened.
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def latency_rows(durations: dict[str, list[float]], top: int) -> list[dict[str, Any]]:
+    grand_total = sum(sum(values) for values in durations.values()) or 1.0
+    rows = []
+    for label, values in durations.items():
+        values.sort()
+        total = sum(values)
+        rows.append(
+            {
+                "label": label,
+                "calls": len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": values[-1],
+                "total": total,
+                "share": total / grand_total,
+            }
+        )
+    rows.sort(key=lambda row: (-row["total"], row["label"]))
+    return rows[:top]
+
+
+def print_latency_table(title: str, rows: list[dict[str, Any]]) -> None:
+    print(f"## By {title}")
+    print()
+    print(f"{title:<40} {'Calls':>7} {'p50 s':>8} {'p95 s':>8} {'Max s':>8} {'Total s':>10} {'Share':>6}")
+    print(f"{'-' * 40} {'-' * 7} {'-' * 8} {'-' * 8} {'-' * 8} {'-' * 10} {'-' * 6}")
+    for row in rows:
+        print(
+            f"{shorten(row['label'], 40):<40} {row['calls']:>7} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+            f"{row['max']:>8.2f} {row['total']:>10.1f} {row['share']:>6.1%}"
+        )
+    print()
+
+
+@profiled("thread_stats")
+def thread_stats(db_path: Path, by: list[str], *, top: int | None, **filters: Any) -> list[dict[str, Any]]:
+    require_db(db_path)
+    where, params = thread_where(db_path, **filters)
+    positions = ", ".join(str(index) for index in range(1, len(by) + 1))
+    if "day" in by or "month" in by:
+        # Newest periods first, so --top N keeps the latest N rather than the oldest.
+        order = ", ".join(f"{index} DESC" if name in ("day", "month") else str(index) for index, name in enumerate(by, 1))
+    else:
+        order = f"{len(by) + 1} DESC, {positions}"
+    sql = f"""
+        SELECT
+            {", ".join(STATS_DIMENSIONS[name] for name in by)},
+            count(*),
+            sum(archived),
+            min(created_at),
+            max(updated_at)
+        FROM threads
+        {where_clause(where)}
+        GROUP BY {positions}
+        ORDER BY {order}
+        LIMIT ?
+    """
+    columns = (*by, "threads", "archived", "first_created_at", "last_updated_at")
+    return [dict(zip(columns, row)) for row in state_rows(db_path, sql, (*params, -1 if top is None else top))]
+
+
+def cmd_stats(args: argparse.Namespace) -> None:
+    import json
+
+    by = list(dict.fromkeys(args.by or ["day"]))
+    groups = thread_stats(
+        STATE_DB,
+        by,
+        top=args.top,
+        archived=args.archived,
+        cwd_prefix=args.cwd,
+        source_query=args.source,
+        model_query=args.model,
+        text_query=args.query,
+        days=args.days,
+        top_level_only=args.top_level_only,
+    )
+    if args.format == "json":
+        print(json.dumps(groups, indent=2))
+        return
+    columns = [STATS_COLUMNS[name] for name in by]
+    header = " ".join(f"{title:<{width}}" for title, width in columns)
+    rule = " ".join("-" * width for _, width in columns)
+    print(f"{header} {'Threads':>8} {'Archived':>8} First UTC           Last UTC")
+    print(f"{rule} {'-' * 8} {'-' * 8} {'-' * 19} {'-' * 19}")
+    for group in groups:
+        keys = " ".join(f"{shorten(str(group[name]), width):<{width}}" for name, (_, width) in zip(by, columns))
+        print(
+            f"{keys} {group['threads']:>8} {group['archived']:>8} "
+            f"{to_utc(group['first_created_at'])} {to_utc(group['last_updated_at'])}"
+        )
+    print()
+    print(f"{sum(group['threads'] for group in groups)} thread(s) in {len(groups)} group(s).")
+
+
+def cmd_latency(args: argparse.Namespace) -> None:
+    import json
+
+    threads = profiled_rows(
+        "fetch_threads",
+        iter_threads(
+            STATE_DB,
+            limit=args.limit,
+            archived=args.archived,
+            cwd_prefix=args.cwd,
+            source_query=args.source,
+            model_query=args.model,
+            text_query=args.query,
+            days=args.days,
+            top_level_only=args.top_level_only,
+        ),
+    )
+    durations: dict[str, defaultdict[str, list[float]]] = {group: defaultdict(list) for group in ("tool", "model", "cwd")}
+    thread_count = 0
+    unanswered = 0
+    for thread, (latencies, pending) in map_threads(tool_call_latencies, threads, args.jobs):
+        thread_count += 1
+        unanswered += pending
+        for name, seconds in latencies:
+            durations["tool"][name].append(seconds)
+            durations["model"][thread.model or "(unknown)"].append(seconds)
+            durations["cwd"][thread.cwd or "(none)"].append(seconds)
+
+    calls = sum(len(values) for values in durations["tool"].values())
+    report = {group: latency_rows(values, args.top) for group, values in durations.items()}
+    if args.format == "json":
+        print(json.dumps({"threads": thread_count, "calls": calls, "unanswered": unanswered, **report}, indent=2))
+        return
+    print("# Tool Call Latency")
+    print()
+    print(f"Paired {calls} tool call(s) across {thread_count} thread(s); {unanswered} call(s) had no output.")
+    print()
+    for group, title in (("tool", "Tool"), ("model", "Model"), ("cwd", "CWD")):
+        print_latency_table(title, report[group])
+
+
+def cmd_reindex(args: argparse.Namespace) -> None:
+    stats = refresh_rollout_paths(full=args.full)
+    print(
+        f"Indexed {stats.rollouts} rollout(s) across {stats.directories} directories; "
+        f"rescanned {stats.rescanned}."
+    )
+
+
+def compress_rollout(path: Path, codec: str, level: int | None) -> Path:
+    import shutil
+
+    target = path.with_name(path.name + ROLLOUT_CODECS[codec][1])
+    tmp_path = target.with_name(target.name + ".partial")
+    try:
+        with path.open("rb") as source, tmp_path.open("wb") as sink:
+            if codec == "gzip":
+                import gzip
+
+                with gzip.GzipFile(filename="", mode="wb", fileobj=sink, compresslevel=level or 6, mtime=0) as writer:
+                    shutil.copyfileobj(source, writer, 1 << 20)
+            else:
+                zstandard_module().ZstdCompressor(level=level or 10).copy_stream(source, sink)
+        shutil.copystat(path, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    path.unlink()
+    return target
+
+
+def record_rollout_move(conn: sqlite3.Connection, original: Path, moved: Path) -> None:
+    stat = moved.stat()
+    old, new = str(original), str(moved)
+    conn.execute("UPDATE rollout_moves SET path = ? WHERE path = ?", (new, old))
+    conn.execute("INSERT OR REPLACE INTO rollout_moves (original, path) VALUES (?, ?)", (old, new))
+    conn.execute("UPDATE rollout_files SET path = ? WHERE path = ?", (new, old))
+    conn.execute(
+        "UPDATE rollout_messages SET rollout_path = ?, size = ?, mtime_ns = ? WHERE rollout_path = ?",
+        (new, stat.st_size, stat.st_mtime_ns, old),
+    )
+
+
+def cmd_archive_compress(args: argparse.Namespace) -> None:
+    if args.codec == "zstd":
+        zstandard_module()
+    roots = [ROLLOUT_ROOTS[1]] + ([ROLLOUT_ROOTS[0]] if args.include_active else [])
+    cutoff = time.time() - args.older_than_days * 86_400
+    refresh_rollout_paths()
+    conn = open_index()
+    candidates = [
+        Path(path)
+        for root in roots
+        for (path,) in conn.execute(
+            "SELECT path FROM rollout_files WHERE path LIKE ? ESCAPE '\\' AND path LIKE '%.jsonl' ORDER BY path",
+            (f"{like_escape(f'{root}{os.sep}')}%",),
+        )
+    ]
+
+    files = before = after = 0
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if stat.st_mtime > cutoff:
+            continue
+        with path.open("rb") as handle:
+            if rollout_codec(handle) is not None:
+                continue
+        files += 1
+        before += stat.st_size
+        if args.dry_run:
+            continue
+        moved = compress_rollout(path, args.codec, args.level)
+        after += moved.stat().st_size
+        with conn:
+            record_rollout_move(conn, path, moved)
+
+    if args.dry_run:
+        print(f"Would compress {files} rollout(s), {before / 1e6:.1f} MB.")
+        return
+    ratio = f" ({after / before:.0%} of original)" if before else ""
+    print(f"Compressed {files} rollout(s): {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB{ratio}.")
+
+
+def split_sentences(message: str) -> Iterable[str]:
+    normalized = re.sub(r"\s+", " ", message).strip()
+    for chunk in re.split(r"(?<=[.!?])\s+|;\s+|\s+\|\s+", normalized):
+        chunk = chunk.strip(" \t\r\n\"'`")
+        if chunk:
+            yield chunk
+
+
+def looks_like_preference(sentence: str) -> bool:
+    rules = signal_rules()
+    lowered = sentence.lower()
+    if rules.noisy_snippet.search(sentence):
+        return False
+    if literal_any(rules.transient_error, lowered):
+        return False
+    if "don't know" in lowered or "do not know" in lowered:
+        return False
+    markers = literal_hits(rules.preference, lowered)
+    if lowered in {"continue", "keep going", "just keep going", "sorry keep going"} or "don't stop" in markers:
+        return True
+    if "come on" in markers or "can't you just" in markers:
+        return True
+    if rules.question_prefix.pattern.match(lowered):
+        return False
+    if sentence.endswith("?") and not markers & {"make sure", "default to", "prefer"}:
+        return False
+    if lowered.startswith("can you") and "make sure" not in markers:
+        return False
+    return bool(markers)
+
+
+@lru_cache(maxsize=NORMALIZE_MEMO_SIZE)
+def normalize_suggestion(sentence: str) -> str:
+    rules = signal_rules()
+    suggestion = sentence.strip()
+    for pattern, replacement in rules.suggestion_rewrites:
+        suggestion = pattern.sub(replacement, suggestion)
+    suggestion = suggestion.strip(" .!?")
+    if not suggestion:
+        return ""
+    lowered = suggestion.lower()
+    if "break up" in lowered and "agents.md" in lowered and "worktogether" in lowered:
+        return "Split multi-file project packets into semantic notes and add a local AGENTS.md that explains file roles, source-of-truth boundaries, and routing."
+    if "don't want the front ends to look ai generated" in lowered or "do not want the front ends to look ai generated" in lowered:
+        return "Avoid AI-generated-looking frontend UI."
+    if lowered in {"continue", "keep going", "just keep going", "sorry keep going"} or "don't stop" in lowered:
+        return "When the user says `continue`, `keep going`, or `don't stop`, keep executing the current task without pausing unless there is a real blocker or destructive approval boundary."
+    if "can't you just find it in my environment" in lowered or lowered == "come on":
+        return "Treat “Come on” or “can't you just...” as frustration cues; inspect the local environment directly, reduce prose, and move forward with concrete actions instead of asking broad questions."
+    if "keep telling the models to keep continuing" in lowered:
+        return "Detect repeated `continue` / `keep going` nudges as a signal to persist autonomously and avoid stopping for unnecessary check-ins."
+    if "human-authored documentation" in lowered and lowered.startswith(("that", "all of this")):
+        return "Write docs and READMEs in human-authored, concrete prose."
+    suggestion = rules.leading_referent.sub("", suggestion)
+    suggestion = suggestion[0].upper() + suggestion[1:]
+    if not suggestion.endswith("."):
+        suggestion += "."
+    return suggestion
+
+
+def known_skill_names() -> list[str]:
+    names = []
+    for root in SKILL_ROOTS:
+        if not root.exists():
+            continue
+        for child in root.iterdir():
+            if child.is_dir() and (child / "SKILL.md").exists():
+                names.append(child.name)
+    return sorted(names, key=len, reverse=True)
+
+
+@lru_cache(maxsize=None)
+def infer_project_agents_path(cwd: str) -> str:
+    path = Path(cwd).expanduser()
+    home = Path.home()
+
+    worktrees_root = CODEX_HOME / "worktrees"
+    try:
+        relative = path.relative_to(worktrees_root)
+    except ValueError:
+        relative = None
+    if relative and len(relative.parts) >= 2:
+        repo_name = relative.parts[1]
+        fallback_repo = worktrees_root / relative.parts[0] / repo_name
+        repo_root = resolve_repo_root_name(repo_name, fallback_repo)
+        for filename in ("AGENTS.md", "AGENTS.MD"):
+            candidate = repo_root / filename
+            if candidate.exists():
+                return str(candidate)
+        return str(repo_root / "AGENTS.md")
+
+    for search_root in (home / "dev", home / "code", home / "personal"):
+        try:
+            relative = path.relative_to(search_root)
+        except ValueError:
+            continue
+        if not relative.parts:
+            break
+        repo_root = resolve_repo_root_name(relative.parts[0], search_root / relative.parts[0])
+        for filename in ("AGENTS.md", "AGENTS.MD"):
+            candidate = repo_root / filename
+            if candidate.exists():
+                return str(candidate)
+        return str(repo_root / "AGENTS.md")
+
+    for candidate_dir in [path, *path.parents]:
+        if candidate_dir == home:
+            break
+        if candidate_dir == CODEX_HOME:
+            break
+        for filename in ("AGENTS.md", "AGENTS.MD"):
+            candidate = candidate_dir / filename
+            if candidate.exists():
+                return str(candidate)
+        if (candidate_dir / ".git").exists():
+            return str(candidate_dir / "AGENTS.md")
+    return str(path / "AGENTS.md")
+
+
+def infer_skill_path(sentence: str, cwd: str, skills: list[str]) -> str:
+    cwd_path = Path(cwd).expanduser()
+    for root in SKILL_ROOTS:
+        try:
+            relative = cwd_path.relative_to(root)
+            if relative.parts:
+                candidate = root / relative.parts[0] / "SKILL.md"
+                if candidate.exists():
+                    return str(candidate)
+        except ValueError:
+            pass
+
+    lowered = sentence.lower()
+    for name in skills:
+        if name not in lowered:
+            continue
+        for root in SKILL_ROOTS:
+            candidate = root / name / "SKILL.md"
+            if candidate.exists():
+                return str(candidate)
+
+    return str(SKILLS_ROOT / "<new-skill>" / "SKILL.md")
+
+
+@profiled("classify_bucket")
+def classify_bucket(sentence: str, thread: ThreadRecord, skills: list[str]) -> tuple[str, str]:
+    lowered = sentence.lower()
+    cwd = thread.cwd or ""
+
+    if (
+        "skill" in lowered
+        or "skill.md" in lowered
+        or "/skills/" in lowered
+        or any(cwd.startswith(str(root)) for root in SKILL_ROOTS)
+    ):
+        return "Skills", infer_skill_path(sentence, cwd, skills)
+
+    if cwd == str(Path.home()) or cwd == str(CODEX_HOME):
+        return "Global AGENTS.md", str(GLOBAL_AGENTS)
+
+    if literal_any(signal_rules().global_scope, lowered):
+        return "Global AGENTS.md", str(GLOBAL_AGENTS)
+
+    if cwd.startswith(str(Path.home() / "vault")) and literal_any(signal_rules().vault_context, lowered):
+        return "Project AGENTS.md", infer_project_agents_path(cwd)
+
+    if not literal_any(signal_rules().project_context, lowered):
+        return "Global AGENTS.md", str(GLOBAL_AGENTS)
+
+    return "Project AGENTS.md", infer_project_agents_path(cwd)
+
+
+@profiled("extract_preference_signals")
+def extract_preference_signals(thread: ThreadRecord) -> list[tuple[str, str]]:
+    import hashlib
+    import json
+
+    messages = collect_user_messages(thread)
+    if not messages:
+        return []
+    digest = hashlib.blake2b("\0".join(messages).encode("utf-8"), digest_size=16).hexdigest()
+    fingerprint = signal_rules_fingerprint()
+
+    conn = open_index()
+    row = conn.execute("SELECT fingerprint, signals FROM signal_cache WHERE content_hash = ?", (digest,)).fetchone()
+    if row and row[0] == fingerprint:
+        COUNTERS["cache.signal_cache.hits"] += 1
+        return [tuple(pair) for pair in json.loads(row[1])]
+
+    COUNTERS["cache.signal_cache.misses"] += 1
+    signals = extract_signals_from_messages(messages)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO signal_cache (content_hash, fingerprint, signals) VALUES (?, ?, ?)",
+            (digest, fingerprint, json.dumps(signals)),
+        )
+    return signals
+
+
+@lru_cache(maxsize=1)
+def signal_rules_fingerprint() -> str:
+    # Anything that can change extract_signals_from_messages output for the same
+    # messages goes in here, including the code of the extraction helpers.
+    import hashlib
+    import inspect
+    import json
+
+    rules = signal_rules()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([PREFERENCE_MARKERS, QUESTION_PREFIXES, TRANSIENT_ERROR_TOKENS]).encode("utf-8"))
+    for pattern in (rules.skip_user_message, rules.noisy_snippet, rules.leading_referent):
+        digest.update(f"{pattern.pattern}\0{pattern.flags}".encode("utf-8"))
+    for pattern, replacement in rules.suggestion_rewrites:
+        digest.update(f"{pattern.pattern}\0{pattern.flags}\0{replacement}".encode("utf-8"))
+    for function in (extract_signals_from_messages, split_sentences, looks_like_preference, normalize_suggestion):
+        digest.update(inspect.getsource(function).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def extract_signals_from_messages(messages: Iterable[str]) -> list[tuple[str, str]]:
+    skip_user_message = signal_rules().skip_user_message
+    signals: list[tuple[str, str]] = []
+    for message in messages:
+        if not message:
+            continue
+        if len(message) > 5000:
+            continue
+        if skip_user_message.search(message):
+            continue
+        for sentence in split_sentences(message):
+            if len(sentence) < 14 or len(sentence) > 600:
+                continue
+            if not looks_like_preference(sentence):
+                continue
+            suggestion = normalize_suggestion(sentence)
+            if len(suggestion) >= 25:
+                signals.append((sentence, suggestion))
+    return signals
+
+
+def thread_evidence(thread: ThreadRecord, target: str) -> Evidence:
+    return Evidence(
+        thread_id=thread.thread_id,
+        title=thread.title,
+        updated_at=thread.updated_at,
+        # Cite where the rollout lives now, e.g. after archive-compress renamed it.
+        rollout_path=str(thread_rollout_path(thread)),
+        cwd=thread.cwd,
+        cluster_key=thread_cluster_key(thread, target),
+    )
+
+
+def reset_worker_state(profile: bool = False) -> None:
+    # Forked workers must not share the parent's SQLite handle.
+    open_index.cache_clear()
+    open_state_db.cache_clear()
+    indexed_user_messages.cache_clear()
+    COUNTERS.clear()
+    PROFILER.enabled = profile
+    PROFILER.trace = False
+    PROFILER.events.clear()
+
+
+def memo_counters() -> Counter[str]:
+    counters: Counter[str] = Counter()
+    for function in (normalize_suggestion, indexed_user_messages, infer_project_agents_path):
+        info = function.cache_info()
+        counters[f"memo.{function.__name__}.hits"] = info.hits
+        counters[f"memo.{function.__name__}.misses"] = info.misses
+    return counters
+
+
+def counted_thread_call(function: Callable[[ThreadRecord], Any], thread: ThreadRecord) -> tuple[Any, Counter[str]]:
+    before = COUNTERS + memo_counters()
+    result = function(thread)
+    return result, (COUNTERS + memo_counters()) - before
+
+
+def resolve_jobs(jobs: int) -> int:
+    if jobs < 0:
+        raise SystemExit("--jobs must be >= 0")
+    return jobs or os.cpu_count() or 1
+
+
+def iter_thread_signals(
+    rows: Iterable[ThreadRecord],
+    jobs: int = 1,
+) -> Iterable[tuple[ThreadRecord, list[tuple[str, str]]]]:
+    return map_threads(extract_preference_signals, rows, jobs)
+
+
+def map_threads(
+    function: Callable[[ThreadRecord], Any],
+    rows: Iterable[ThreadRecord],
+    jobs: int = 1,
+) -> Iterable[tuple[ThreadRecord, Any]]:
+    jobs = resolve_jobs(jobs)
+    if isinstance(rows, list):
+        jobs = min(jobs, len(rows))
+    if jobs <= 1:
+        for thread in rows:
+            yield thread, function(thread)
+        return
+
+    # map() preserves input order, so grouping downstream matches a serial run.
+    # Batches keep a streamed cursor from being drained into the pool up front.
+    from concurrent.futures import ProcessPoolExecutor
+
+    threads = iter(rows)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=reset_worker_state, initargs=(PROFILER.enabled,)) as pool:
+        while batch := list(islice(threads, jobs * SIGNAL_BATCH_PER_JOB)):
+            chunksize = max(1, len(batch) // (jobs * 8))
+            results = pool.map(partial(counted_thread_call, function), batch, chunksize=chunksize)
+            for thread, (result, counters) in zip(batch, results):
+                COUNTERS.update(counters)
+                yield thread, result
+
+
+def classify_signals(thread: ThreadRecord, signals: list[tuple[str, str]], skills: list[str]) -> list[tuple[str, str, str]]:
+    seen: set[tuple[str, str, str]] = set()
+    classified: list[tuple[str, str, str]] = []
+    for raw_sentence, suggestion in signals:
+        bucket, target = classify_bucket(raw_sentence, thread, skills)
+        key = (bucket, target, suggestion.lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        classified.append((bucket, target, suggestion))
+    return classified
+
+
+def group_proposals(
+    contributions: Iterable[tuple[Evidence, str, str, str]],
+    min_support: int,
+    *,
+    merge_similar: bool = False,
+) -> list[Proposal]:
+    grouped: dict[tuple[str, str, str], Proposal] = {}
+    for evidence, bucket, target, suggestion in contributions:
+        key = (bucket, target, suggestion.lower())
+        proposal = grouped.get(key)
+        if proposal is None:
+            proposal = grouped[key] = Proposal(bucket=bucket, target=target, suggestion=suggestion)
+        proposal.add_evidence(evidence)
+
+    candidates = list(grouped.values())
+    if merge_similar:
+        candidates = merge_near_duplicate_proposals(candidates)
+    proposals = [
+        proposal.freeze()
+        for proposal in candidates
+        if proposal.support >= min_support
+    ]
+    return sorted(
+        proposals,
+        key=lambda item: (item.bucket, -item.confidence, -item.support, -item.last_seen, item.target),
+    )
+
+
+def collect_proposals(
+    rows: list[ThreadRecord],
+    min_support: int,
+    *,
+    jobs: int = 1,
+    merge_similar: bool = False,
+) -> list[Proposal]:
+    skills = known_skill_names()
+    contributions = (
+        (thread_evidence(thread, target), bucket, target, suggestion)
+        for thread, signals in iter_thread_signals(rows, jobs)
+        for bucket, target, suggestion in classify_signals(thread, signals, skills)
+    )
+    return group_proposals(contributions, min_support, merge_similar=merge_similar)
+
+
+def dream_scope(args: argparse.Namespace) -> str:
+    # Folding in the rule fingerprint starts a fresh ledger whenever the extraction
+    # heuristics change. Bucket and target are not stored, so skill and AGENTS.md
+    # changes only need a replay, not a new ledger.
+    import json
+
+    return json.dumps(
+        {
+            "archived": args.archived,
+            "cwd": args.cwd,
+            "query": args.query,
+            "days": args.days,
+            "limit": args.limit,
+            "rules": signal_rules_fingerprint(),
+        },
+        sort_keys=True,
+    )
+
+
+def update_dream_ledger(scope: str, rows: list[ThreadRecord], *, jobs: int) -> None:
+    conn = open_index()
+    # Drain the pool before taking the write lock: workers write signal_cache and
+    # rollout_messages to this same database while they mine.
+    mined = list(iter_thread_signals(rows, jobs))
+    with conn:
+        for thread, signals in mined:
+            conn.execute("DELETE FROM dream_signals WHERE scope = ? AND thread_id = ?", (scope, thread.thread_id))
+            conn.execute(
+                f"INSERT OR REPLACE INTO dream_ledger (scope, {LEDGER_THREAD_COLUMNS}) VALUES ({', '.join('?' * 13)})",
+                (scope, *astuple(thread)),
+            )
+            conn.executemany(
+                "INSERT INTO dream_signals (scope, thread_id, signal_index, sentence, suggestion) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (scope, thread.thread_id, index, sentence, suggestion)
+                    for index, (sentence, suggestion) in enumerate(signals)
+                ],
+            )
+        if rows:
+            mark = max((row.updated_at, row.thread_id) for row in rows)
+            previous = load_dream_mark(scope)
+            if previous is None or mark > previous:
+                conn.execute(
+                    "INSERT OR REPLACE INTO dream_runs (scope, updated_at, thread_id) VALUES (?, ?, ?)",
+                    (scope, mark[0], mark[1]),
+                )
+
+
+def load_dream_mark(scope: str) -> tuple[int, str] | None:
+    row = open_index().execute("SELECT updated_at, thread_id FROM dream_runs WHERE scope = ?", (scope,)).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def load_dream_ledger(
+    scope: str,
+    *,
+    days: int | None,
+    limit: int | None,
+    min_support: int,
+    merge_similar: bool = False,
+) -> tuple[ThreadSpan, list[Proposal]]:
+    conn = open_index()
+    cutoff = days_cutoff(days) if days else 0
+    with conn:
+        conn.execute(
+            """
+            DELETE FROM dream_signals
+            WHERE scope = ? AND thread_id IN (SELECT thread_id FROM dream_ledger WHERE scope = ? AND updated_at < ?)
+            """,
+            (scope, scope, cutoff),
+        )
+        conn.execute("DELETE FROM dream_ledger WHERE scope = ? AND updated_at < ?", (scope, cutoff))
+
+    # Replay the threads a full run would visit, in the same order, and classify their
+    # signals now so targets follow the current skills and AGENTS.md files.
+    threads = [
+        thread_record(row)
+        for row in conn.execute(
+            f"""
+            SELECT {LEDGER_THREAD_COLUMNS} FROM dream_ledger
+            WHERE scope = ?
+            ORDER BY updated_at DESC, thread_id DESC
+            LIMIT ?
+            """,
+            (scope, -1 if limit is None else limit),
+        )
+    ]
+    skills = known_skill_names()
+    contributions = (
+        (thread_evidence(thread, target), bucket, target, suggestion)
+        for thread in threads
+        for bucket, target, suggestion in classify_signals(thread, ledger_signals(conn, scope, thread.thread_id), skills)
+    )
+    return thread_span(threads), group_proposals(contributions, min_support, merge_similar=merge_similar)
+
+
+def ledger_signals(conn: sqlite3.Connection, scope: str, thread_id: str) -> list[tuple[str, str]]:
+    return conn.execute(
+        "SELECT sentence, suggestion FROM dream_signals WHERE scope = ? AND thread_id = ? ORDER BY signal_index",
+        (scope, thread_id),
+    ).fetchall()
+
+
+def thread_span(rows: list[ThreadRecord]) -> ThreadSpan:
+    if not rows:
+        return ThreadSpan(0, 0, 0)
+    return ThreadSpan(
+        len(rows),
+        min(row.updated_at for row in rows),
+        max(row.updated_at for row in rows),
+    )
+
+
+def stream_dream_proposals(
+    threads: Iterable[ThreadRecord],
+    *,
+    min_support: int,
+    min_confidence: float,
+    max_per_bucket: int,
+    jobs: int,
+) -> tuple[ThreadSpan, list[Proposal]]:
+    import heapq
+
+    skills = known_skill_names()
+    # An empty filename gives a private temporary database that SQLite pages to disk
+    # once it outgrows its cache and deletes on close.
+    spill = sqlite3.connect("")
+    try:
+        spill.execute(
+            """
+            CREATE TABLE contributions (
+                seq INTEGER PRIMARY KEY,
+                bucket TEXT NOT NULL,
+                target TEXT NOT NULL,
+                lowered TEXT NOT NULL,
+                suggestion TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                updated_at INTEGER NOT NULL,
+                rollout_path TEXT NOT NULL,
+                cwd TEXT NOT NULL,
+                cluster_key TEXT NOT NULL
+            )
+            """
+        )
+        count, oldest, newest = 0, 0, 0
+        batch: list[tuple[Any, ...]] = []
+        for thread, signals in iter_thread_signals(threads, jobs):
+            count += 1
+            oldest = min(oldest or thread.updated_at, thread.updated_at)
+            newest = max(newest, thread.updated_at)
+            for bucket, target, suggestion in classify_signals(thread, signals, skills):
+                batch.append(
+                    (
+                        bucket,
+                        target,
+                        suggestion.lower(),
+                        suggestion,
+                        thread.thread_id,
+                        thread.title,
+                        thread.updated_at,
+                        thread.rollout_path,
+                        thread.cwd,
+                        thread_cluster_key(thread, target),
+                    )
+                )
+            if len(batch) >= SPILL_BATCH_SIZE:
+                spill_contributions(spill, batch)
+        spill_contributions(spill, batch)
+        spill.execute("CREATE INDEX contributions_group ON contributions (bucket, target, lowered, seq)")
+
+        # seq follows thread visit order, so min(seq) reproduces group_proposals'
+        # first-seen suggestion text and its tie-break order.
+        groups = spill.execute(
+            """
+            SELECT g.bucket, g.target, g.lowered, c.suggestion, g.first_seq, g.support, g.last_seen
+            FROM (
+                SELECT bucket, target, lowered, min(seq) AS first_seq,
+                       count(DISTINCT cluster_key) AS support, max(updated_at) AS last_seen
+                FROM contributions
+                GROUP BY bucket, target, lowered
+            ) AS g
+            JOIN contributions AS c ON c.seq = g.first_seq
+            WHERE g.support >= ?
+            """,
+            (min_support,),
+        )
+        # The patch preview caps each target separately, so keep top-K per target;
+        # every bucket's top-K is contained in the union of its targets' heaps.
+        heaps: dict[tuple[str, str], list[tuple[float, int, int, int, str, str]]] = defaultdict(list)
+        for bucket, target, lowered, suggestion, first_seq, support, last_seen in groups:
+            confidence = proposal_confidence(bucket, suggestion, support)
+            if confidence < min_confidence:
+                continue
+            heap = heaps[(bucket, target)]
+            item = (confidence, support, last_seen, -first_seq, lowered, suggestion)
+            if len(heap) < max_per_bucket:
+                heapq.heappush(heap, item)
+            elif heap and item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        ranked = sorted(
+            (
+                (bucket, -confidence, -support, -last_seen, target, -neg_seq, lowered, suggestion)
+                for (bucket, target), heap in heaps.items()
+                for confidence, support, last_seen, neg_seq, lowered, suggestion in heap
+            )
+        )
+        proposals = []
+        for bucket, _, _, last_seen, target, _, lowered, suggestion in ranked:
+            proposal = Proposal(bucket=bucket, target=target, suggestion=suggestion, last_seen=-last_seen)
+            group = (bucket, target, lowered)
+            for row in spill.execute(
+                """
+                SELECT thread_id, title, updated_at, rollout_path, cwd, cluster_key
+                FROM contributions
+                WHERE bucket = ? AND target = ? AND lowered = ?
+                ORDER BY seq
+                LIMIT 3
+                """,
+                group,
+            ):
+                thread_id, title, updated_at, rollout_path, cwd, cluster_key = row
+                rollout_path = str(resolve_rollout_path(thread_id, rollout_path))
+                proposal.add_evidence(Evidence(thread_id, title, updated_at, rollout_path, cwd, cluster_key))
+            proposal.cluster_keys.update(
+                key
+                for (key,) in spill.execute(
+                    "SELECT DISTINCT cluster_key FROM contributions WHERE bucket = ? AND target = ? AND lowered = ?",
+                    group,
+                )
+            )
+            proposals.append(proposal.freeze())
+        return ThreadSpan(count, oldest, newest), proposals
+    finally:
+        spill.close()
+
+
+def spill_contributions(spill: sqlite3.Connection, batch: list[tuple[Any, ...]]) -> None:
+    spill.executemany(
+        """
+        INSERT INTO contributions (
+            bucket, target, lowered, suggestion, thread_id, title, updated_at, rollout_path, cwd, cluster_key
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        batch,
+    )
+    batch.clear()
+
+
+def skill_aliases(name: str, skill_path: Path) -> tuple[str, ...]:
+    aliases = {
+        name.lower(),
+        f"${name.lower()}",
+        name.lower().replace("-", " "),
+        str(skill_path).lower(),
+        skill_path.parent.name.lower(),
+    }
+    return tuple(sorted(alias for alias in aliases if alias))
+
+
+def parse_skill_name(skill_text: str, fallback_name: str) -> str:
+    match = re.search(r"^name:\s*['\"]?([^'\"\n]+)['\"]?\s*$", skill_text, re.MULTILINE)
+    return match.group(1).strip() if match else fallback_name
+
+
+@lru_cache(maxsize=1)
+def load_skill_records() -> tuple[SkillRecord, ...]:
+    records: list[SkillRecord] = []
+    for root in SKILL_ROOTS:
+        if not root.exists():
+            continue
+        for skill_file in sorted(root.glob("*/SKILL.md")):
+            text = skill_file.read_text(encoding="utf-8")
+            name = parse_skill_name(text, skill_file.parent.name)
+            # Each line/sentence is a segment, plus the whole text, so near-duplicates
+            # of one bullet are caught as well as a suggestion that restates the file.
+            segments = [sentence for line in text.splitlines() for sentence in split_sentences(line)]
+            shingle_index, segment_sizes = build_shingle_index([*segments, text])
+            records.append(
+                SkillRecord(
+                    name=name,
+                    path=skill_file,
+                    text=text,
+                    aliases=skill_aliases(name, skill_file),
+                    normalized_text=" ".join(text.lower().split()),
+                    tokens=frozenset(normalize_tokens(text)),
+                    shingle_index=shingle_index,
+                    segment_sizes=segment_sizes,
+                )
+            )
+    return tuple(sorted(records, key=lambda record: record.name))
+
+
+def build_alias_matcher(skills: list[SkillRecord]) -> LiteralMatcher:
+    owners: dict[str, set[int]] = defaultdict(set)
+    for index, skill in enumerate(skills):
+        for alias in skill.aliases:
+            owners[alias].add(index)
+    return build_literal_matcher(owners)
+
+
+def matching_skills(matcher: LiteralMatcher, thread: ThreadRecord, user_messages: list[str]) -> set[int]:
+    haystack = " ".join(
+        [
+            thread.title or "",
+            thread.cwd or "",
+            *user_messages,
+        ]
+    ).lower()
+    return literal_hits(matcher, haystack)
+
+
+def suggestion_already_documented(skill: SkillRecord, suggestion: str) -> bool:
+    suggestion_tokens = normalize_tokens(suggestion)
+    if len(suggestion_tokens) < 3:
+        return False
+
+    suggestion_text = " ".join(suggestion.lower().split())
+    if suggestion_text in skill.normalized_text:
+        return True
+
+    overlap = len(suggestion_tokens & skill.tokens) / max(len(suggestion_tokens), 1)
+    if overlap >= 0.85:
+        return True
+
+    return near_duplicate_segment(skill, suggestion)
+
+
+def near_duplicate_segment(skill: SkillRecord, suggestion: str) -> bool:
+    shingles = char_shingles(suggestion)
+    if not shingles:
+        return False
+    shared: Counter[int] = Counter()
+    for shingle in shingles:
+        shared.update(skill.shingle_index.get(shingle, ()))
+    size = len(shingles)
+    return any(
+        2 * count / (size + skill.segment_sizes[segment_id]) >= NEAR_DUPLICATE_RATIO
+        for segment_id, count in shared.items()
+    )
+
+
+def collect_skill_audit_proposals(
+    rows: list[ThreadRecord],
+    *,
+    skill_name: str | None,
+    min_support: int,
+    jobs: int = 1,
+    merge_similar: bool = False,
+) -> tuple[list[Proposal], list[SkillRecord]]:
+    all_skills = list(load_skill_records())
+    if skill_name:
+        needle = skill_name.lower()
+        selected_skills = [
+            skill
+            for skill in all_skills
+            if skill.name.lower() == needle or skill.path.parent.name.lower() == needle or needle in skill.aliases
+        ]
+        if not selected_skills:
+            raise SystemExit(f"No installed skill matched {skill_name!r}")
+    else:
+        selected_skills = all_skills
+
+    grouped: dict[tuple[str, str], Proposal] = {}
+    matcher = build_alias_matcher(selected_skills)
+
+    for thread, signals in iter_thread_signals(rows, jobs):
+        suggestions = [suggestion for _, suggestion in signals]
+        if not suggestions:
+            continue
+        matched = matching_skills(matcher, thread, collect_user_messages(thread))
+
+        for skill in (selected_skills[index] for index in sorted(matched)):
+            for suggestion in suggestions:
+                if suggestion_already_documented(skill, suggestion):
+                    continue
+                key = (str(skill.path), suggestion.lower())
+                proposal = grouped.get(key)
+                if proposal is None:
+                    proposal = grouped[key] = Proposal(bucket="Skills", target=str(skill.path), suggestion=suggestion)
+                elif thread.thread_id in proposal.thread_ids:
+                    continue
+                proposal.add_evidence(thread_evidence(thread, str(skill.path)))
+
+    candidates = list(grouped.values())
+    if merge_similar:
+        candidates = merge_near_duplicate_proposals(candidates)
+    proposals = [
+        proposal.freeze()
+        for proposal in candidates
+        if proposal.support >= min_support
+    ]
+    return (
+        sorted(proposals, key=lambda item: (-item.confidence, -item.support, -item.last_seen, item.target)),
+        selected_skills,
+    )
+
+
+@profiled("emit_skill_audit_report")
+def emit_skill_audit_report(
+    span: ThreadSpan,
+    proposals: list[Proposal],
+    selected_skills: list[SkillRecord],
+    *,
+    max_per_skill: int,
+    emit_patch: bool,
+) -> None:
+    newest, oldest = span.newest, span.oldest
+
+    print("# /self-improve skill-audit")
+    print()
+    print(
+        f"Analyzed {span.count} top-level user threads from {to_utc(oldest) if oldest else 'n/a'} "
+        f"to {to_utc(newest) if newest else 'n/a'} across {len(selected_skills)} installed skill(s)."
+    )
+    print("Default write policy: propose-first. Do not patch SKILL.md files until the user explicitly approves.")
+    print()
+
+    by_target: dict[str, list[Proposal]] = defaultdict(list)
+    for proposal in proposals:
+        by_target[proposal.target].append(proposal)
+
+    if not proposals:
+        print("- No uncovered skill proposals found in this sample.")
+        print()
+        return
+
+    for target in sorted(by_target):
+        print(f"## {target}")
+        print()
+        for proposal in by_target[target][:max_per_skill]:
+            evidence_bits = []
+            for item in proposal.evidence[:3]:
+                evidence_bits.append(
+                    f"{item.thread_id} | {shorten(item.title, 60)} | {to_utc(item.updated_at)} | {item.rollout_path}"
+                )
+            print(f"- Proposal: {proposal.suggestion}")
+            print(f"  Support: {proposal.support} thread cluster(s)")
+            print(f"  Confidence: {proposal.confidence:.2f}")
+            print(f"  Evidence: {' || '.join(evidence_bits)}")
+        print()
+
+    if emit_patch:
+        print("## Patch Preview")
+        print()
+        for target in sorted(by_target):
+            print("```diff")
+            print(f"--- {target}")
+            print(f"+++ {target}")
+            print("@@")
+            for proposal in by_target[target][:max_per_skill]:
+                print(f"+- {proposal.suggestion}")
+            print("```")
+            print()
+
+
+@profiled("emit_patch_preview")
+def emit_patch_preview(proposals: list[Proposal], max_per_bucket: int) -> None:
+    grouped: dict[str, dict[str, list[Proposal]]] = defaultdict(lambda: defaultdict(list))
+    for proposal in proposals:
+        grouped[proposal.bucket][proposal.target].append(proposal)
+
+    print("## Patch Preview")
+    print()
+    for bucket in ("Skills", "Project AGENTS.md", "Global AGENTS.md"):
+        if not grouped.get(bucket):
+            continue
+        print(f"### {bucket}")
+        print()
+        for target, target_items in grouped[bucket].items():
+            print("```diff")
+            print(f"--- {target}")
+            print(f"+++ {target}")
+            print("@@")
+            for proposal in target_items[:max_per_bucket]:
+                print(f"+- {proposal.suggestion}")
+            print("```")
+            print()
+
+
+@profiled("emit_dream_report")
+def emit_dream_report(
+    span: ThreadSpan,
+    proposals: list[Proposal],
+    *,
+    max_per_bucket: int,
+    emit_patch: bool,
+) -> None:
+    newest, oldest = span.newest, span.oldest
+
+    print("# /self-improve dream")
+    print()
+    print(f"Analyzed {span.count} top-level user threads from {to_utc(oldest) if oldest else 'n/a'} to {to_utc(newest) if newest else 'n/a'}.")
+    print("Default write policy: propose-first. Do not patch files until the user explicitly approves.")
+    print()
+
+    buckets = ("Skills", "Project AGENTS.md", "Global AGENTS.md")
+    by_bucket: dict[str, list[Proposal]] = defaultdict(list)
+    for proposal in proposals:
+        by_bucket[proposal.bucket].append(proposal)
+
+    for bucket in buckets:
+        print(f"## {bucket}")
+        print()
+        bucket_items = by_bucket.get(bucket, [])
+        if not bucket_items:
+            print("- No strong proposals found in this sample.")
+            print()
+            continue
+
+        for proposal in bucket_items[:max_per_bucket]:
+            evidence_bits = []
+            for item in proposal.evidence[:3]:
+                evidence_bits.append(
+                    f"{item.thread_id} | {shorten(item.title, 60)} | {to_utc(item.updated_at)} | {item.rollout_path}"
+                )
+            print(f"- Target: `{proposal.target}`")
+            print(f"  Proposal: {proposal.suggestion}")
+            print(f"  Support: {proposal.support} thread cluster(s)")
+            print(f"  Confidence: {proposal.confidence:.2f}")
+            print(f"  Evidence: {' || '.join(evidence_bits)}")
+        print()
+
+    if emit_patch and proposals:
+        emit_patch_preview(proposals, max_per_bucket=max_per_bucket)
+
+
+def cmd_dream(args: argparse.Namespace) -> None:
+    scope = dream_scope(args) if args.incremental else None
+    since = load_dream_mark(scope) if scope else None
+    filters = dict(
+        limit=None if since else args.limit,
+        archived=args.archived,
+        cwd_prefix=args.cwd,
+        source_query=None,
+        model_query=None,
+        text_query=args.query,
+        days=args.days,
+        top_level_only=True,
+        since=since,
+    )
+    if args.stream and args.merge_similar:
+        raise SystemExit("--merge-similar needs every proposal group in memory; drop --stream to use it")
+    if args.stream:
+        span, proposals = stream_dream_proposals(
+            profiled_rows("fetch_threads", iter_threads(STATE_DB, **filters)),
+            min_support=args.min_support,
+            min_confidence=args.min_confidence,
+            max_per_bucket=args.max_per_bucket,
+            jobs=args.jobs,
+        )
+        emit_dream_report(span, proposals, max_per_bucket=args.max_per_bucket, emit_patch=args.emit_patch)
+        return
+
+    rows = fetch_threads(STATE_DB, **filters)
+    if scope:
+        update_dream_ledger(scope, rows, jobs=args.jobs)
+        span, proposals = load_dream_ledger(
+            scope,
+            days=args.days,
+            limit=args.limit,
+            min_support=args.min_support,
+            merge_similar=args.merge_similar,
+        )
+    else:
+        span, proposals = thread_span(rows), collect_proposals(
+            rows,
+            min_support=args.min_support,
+            jobs=args.jobs,
+            merge_similar=args.merge_similar,
+        )
+    proposals = [
+        proposal
+        for proposal in proposals
+        if proposal.confidence >= args.min_confidence
+    ]
+    emit_dream_report(
+        span,
+        proposals,
+        max_per_bucket=args.max_per_bucket,
+        emit_patch=args.emit_patch,
+    )
+
+
+def cmd_skill_audit(args: argparse.Namespace) -> None:
+    rows = fetch_threads(
+        STATE_DB,
+        limit=args.limit,
+        archived=args.archived,
+        cwd_prefix=None,
+        source_query=None,
+        model_query=None,
+        text_query=args.query,
+        days=args.days,
+        top_level_only=True,
+    )
+    proposals, selected_skills = collect_skill_audit_proposals(
+        rows,
+        skill_name=args.skill,
+        min_support=args.min_support,
+        jobs=args.jobs,
+        merge_similar=args.merge_similar,
+    )
+    proposals = [
+        proposal
+        for proposal in proposals
+        if proposal.confidence >= args.min_confidence
+    ]
+    emit_skill_audit_report(
+        thread_span(rows),
+        proposals,
+        selected_skills,
+        max_per_skill=args.max_per_skill,
+        emit_patch=args.emit_patch,
+    )
+
+
+def profile_summary(command: str, wall_seconds: float) -> dict[str, Any]:
+    counters = COUNTERS + memo_counters()
+    stages: dict[str, dict[str, Any]] = {}
+    caches: dict[str, dict[str, Any]] = {}
+    for key, value in sorted(counters.items()):
+        kind, _, rest = key.partition(".")
+        name, _, metric = rest.rpartition(".")
+        if kind == "stage":
+            stage = stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            stage[metric] = round(value, 6) if metric == "seconds" else value
+        elif kind in {"cache", "memo"}:
+            cache = caches.setdefault(f"{kind}.{name}", {"hits": 0, "misses": 0})
+            cache[metric] = value
+    for cache in caches.values():
+        lookups = cache["hits"] + cache["misses"]
+        cache["hit_rate"] = round(cache["hits"] / lookups, 4) if lookups else None
+    return {
+        "command": command,
+        "wall_seconds": round(wall_seconds, 6),
+        "stages": stages,
+        "bytes": {
+            "rollout_read": counters["rollout.bytes_read"],
+            "rollout_scanned": counters["rollout.bytes_skipped"] + counters["rollout.bytes_decoded"],
+            "rollout_decoded": counters["rollout.bytes_decoded"],
+            "rollout_files_scanned": counters["rollout.files_scanned"],
+            "rollout_events_decoded": counters["rollout.events_decoded"],
+        },
+        "caches": caches,
+    }
+
+
+def emit_profile(args: argparse.Namespace, wall_seconds: float) -> None:
+    import json
+
+    print(json.dumps(profile_summary(args.command, wall_seconds), indent=2), file=sys.stderr)
+    if args.profile_trace:
+        trace = {
+            "traceEvents": [
+                {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"self_improve.py {args.command}"}},
+                *PROFILER.events,
+            ],
+            "displayTimeUnit": "ms",
+        }
+        Path(args.profile_trace).write_text(json.dumps(trace), encoding="utf-8")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="self_improve.py",
+        description="Browse Codex sessions and propose self-improvement edits.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-stage wall time, call counts, bytes read, and cache hit rates as JSON on stderr.",
+    )
+    common.add_argument("--profile-trace", metavar="PATH", help="Also write a Chrome trace-event file (implies --profile).")
+
+    list_parser = subparsers.add_parser("list", parents=[common], help="List Codex sessions from state_5.sqlite.")
+    list_parser.add_argument("--limit", type=int, default=25)
+    list_parser.add_argument("--archived", choices=("active", "archived", "all"), default="active")
+    list_parser.add_argument("--cwd")
+    list_parser.add_argument("--source")
+    list_parser.add_argument("--model")
+    list_parser.add_argument("--query")
+    list_parser.add_argument("--days", type=int)
+    list_parser.add_argument("--top-level-only", action="store_true")
+    list_parser.set_defaults(func=cmd_list)
+
+    show_parser = subparsers.add_parser("show", parents=[common], help="Render one thread as a readable transcript.")
+    show_parser.add_argument("thread_id")
+    show_parser.add_argument("--max-tool-chars", type=int, default=1600)
+    show_parser.add_argument("--include-instructions", action="store_true")
+    show_parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep polling the rollout and render appended events as they arrive (Ctrl-C to stop).",
+    )
+    show_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between --follow polls.")
+    show_parser.set_defaults(func=cmd_show)
+
+    export_parser = subparsers.add_parser(
+        "export",
+        parents=[common],
+        help="Write one Markdown or JSONL transcript per matching thread, rendered in parallel.",
+    )
+    export_parser.add_argument("out", type=Path, help="Output directory (created if missing).")
+    export_parser.add_argument("--format", choices=("md", "jsonl"), default="md")
+    export_parser.add_argument("--limit", type=int, help="Default: every matching thread.")
+    export_parser.add_argument("--archived", choices=("active", "archived", "all"), default="active")
+    export_parser.add_argument("--cwd")
+    export_parser.add_argument("--source")
+    export_parser.add_argument("--model")
+    export_parser.add_argument("--query")
+    export_parser.add_argument("--days", type=int)
+    export_parser.add_argument("--top-level-only", action="store_true")
+    export_parser.add_argument("--max-tool-chars", type=int, default=1600, help="Markdown only; JSONL keeps full payloads.")
+    export_parser.add_argument("--include-instructions", action="store_true", help="Markdown only.")
+    export_parser.add_argument("--jobs", type=int, default=0, help="Worker processes (0 = all cores).")
+    export_parser.set_defaults(func=cmd_export)
+
+    stats_parser = subparsers.add_parser(
+        "stats",
+        parents=[common],
+        help="Count sessions per day, month, model, source, or cwd with GROUP BY inside SQLite.",
+    )
+    stats_parser.add_argument(
+        "--by",
+        action="append",
+        choices=tuple(STATS_DIMENSIONS),
+        help="Group by this dimension; repeat to nest (default: day, from created_at in UTC).",
+    )
+    stats_parser.add_argument("--top", type=int, help="Only the first N groups.")
+    stats_parser.add_argument("--archived", choices=("active", "archived", "all"), default="all")
+    stats_parser.add_argument("--cwd")
+    stats_parser.add_argument("--source")
+    stats_parser.add_argument("--model")
+    stats_parser.add_argument("--query")
+    stats_parser.add_argument("--days", type=int)
+    stats_parser.add_argument("--top-level-only", action="store_true")
+    stats_parser.add_argument("--format", choices=("table", "json"), default="table")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    latency_parser = subparsers.add_parser(
+        "latency",
+        parents=[common],
+        help="Tool-call p50/p95/max durations per tool, model, and cwd, paired by call_id.",
+    )
+    latency_parser.add_argument("--limit", type=int, help="Default: every matching thread.")
+    latency_parser.add_argument("--archived", choices=("active", "archived", "all"), default="all")
+    latency_parser.add_argument("--cwd")
+    latency_parser.add_argument("--source")
+    latency_parser.add_argument("--model")
+    latency_parser.add_argument("--query")
+    latency_parser.add_argument("--days", type=int, default=30)
+    latency_parser.add_argument("--top-level-only", action="store_true")
+    latency_parser.add_argument("--top", type=int, default=20, help="Rows per table.")
+    latency_parser.add_argument("--format", choices=("table", "json"), default="table")
+    latency_parser.add_argument("--jobs", type=int, default=1, help="Worker processes (0 = all cores).")
+    latency_parser.set_defaults(func=cmd_latency)
+
+    reindex_parser = subparsers.add_parser(
+        "reindex",
+        parents=[common],
+        help="Refresh the thread id to rollout path index used for orphan lookup.",
+    )
+    reindex_parser.add_argument("--full", action="store_true", help="Drop the index and walk every directory.")
+    reindex_parser.set_defaults(func=cmd_reindex)
+
+    archive_parser = subparsers.add_parser(
+        "archive-compress",
+        parents=[common],
+        help="Compress old archived rollouts in place; the sidecar index remembers where each one went.",
+    )
+    archive_parser.add_argument("--older-than-days", type=int, default=30, help="Only rollouts not modified for this long.")
+    archive_parser.add_argument("--codec", choices=tuple(ROLLOUT_CODECS), default="gzip", help="zstd needs the zstandard package.")
+    archive_parser.add_argument("--level", type=int, help="Compression level (default: gzip 6, zstd 10).")
+    archive_parser.add_argument(
+        "--include-active",
+        action="store_true",
+        help="Also compress old rollouts under sessions/. Codex itself only reads plain .jsonl when resuming.",
+    )
+    archive_parser.add_argument("--dry-run", action="store_true")
+    archive_parser.set_defaults(func=cmd_archive_compress)
+
+    dream_parser = subparsers.add_parser(
+        "dream",
+        parents=[common],
+        help="Mine user preference signals and emit improvement proposals.",
+    )
+    dream_parser.add_argument("--limit", type=int, default=250)
+    dream_parser.add_argument("--days", type=int, default=365)
+    dream_parser.add_argument("--archived", choices=("active", "archived", "all"), default="all")
+    dream_parser.add_argument("--cwd")
+    dream_parser.add_argument("--query")
+    dream_parser.add_argument("--min-support", type=int, default=1)
+    dream_parser.add_argument("--min-confidence", type=float, default=0.5)
+    dream_parser.add_argument("--max-per-bucket", type=int, default=25)
+    dream_parser.add_argument("--emit-patch", action="store_true")
+    dream_parser.add_argument("--jobs", type=int, default=1, help="Worker processes for signal extraction (0 = all cores).")
+    dream_parser.add_argument(
+        "--merge-similar",
+        action="store_true",
+        help="Merge near-duplicate phrasings (MinHash/LSH over word shingles) into one proposal before --min-support.",
+    )
+    dream_mode = dream_parser.add_mutually_exclusive_group()
+    dream_mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only mine threads updated since the last incremental run with the same filters and --limit; "
+            "the report covers the newest --limit threads in the ledger, like a full run."
+        ),
+    )
+    dream_mode.add_argument(
+        "--stream",
+        action="store_true",
+        help="Bounded memory: stream threads, spill evidence to a temp database, keep only top-K per bucket.",
+    )
+    dream_parser.set_defaults(func=cmd_dream)
+
+    skill_audit_parser = subparsers.add_parser(
+        "skill-audit",
+        parents=[common],
+        help="Audit installed skills against prior sessions and emit uncovered SKILL.md proposals.",
+    )
+    skill_audit_parser.add_argument("--skill", help="Audit one skill by name or folder name.")
+    skill_audit_parser.add_argument("--limit", type=int, default=500)
+    skill_audit_parser.add_argument("--days", type=int, default=365)
+    skill_audit_parser.add_argument("--archived", choices=("active", "archived", "all"), default="all")
+    skill_audit_parser.add_argument("--query")
+    skill_audit_parser.add_argument("--min-support", type=int, default=1)
+    skill_audit_parser.add_argument("--min-confidence", type=float, default=0.6)
+    skill_audit_parser.add_argument("--max-per-skill", type=int, default=8)
+    skill_audit_parser.add_argument("--emit-patch", action="store_true")
+    skill_audit_parser.add_argument("--jobs", type=int, default=1, help="Worker processes for signal extraction (0 = all cores).")
+    skill_audit_parser.add_argument(
+        "--merge-similar",
+        action="store_true",
+        help="Merge near-duplicate phrasings (MinHash/LSH over word shingles) into one proposal before --min-support.",
+    )
+    skill_audit_parser.set_defaults(func=cmd_skill_audit)
+
+    return parser
+
+
+def main() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.profile or args.profile_trace:
+        PROFILER.start(trace=bool(args.profile_trace))
+    started = time.perf_counter()
+    try:
+        args.func(args)
+    finally:
+        if PROFILER.enabled:
+            finished = time.perf_counter()
+            PROFILER.record(args.command, started, finished)
+            emit_profile(args, finished - started)
+
@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""Regression checks for the session browser against a throwaway Codex home."""
+
+from __future__ import annotations
+
+import contextlib
+import gc
+import gzip
+import importlib.util
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+import unittest.mock
+import warnings
+from pathlib import Path
+
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "self_improve_core.py"
+
+
+def load_module(home: Path):
+    os.environ["HOME"] = str(home)
+    os.environ["CODEX_HOME"] = str(home / ".codex")
+    spec = importlib.util.spec_from_file_location("self_improve_core", SCRIPT)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_rollout(path: Path, thread_id: str, messages: list[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    events = [{"type": "session_meta", "payload": {"id": thread_id}}]
+    for message in messages:
+        events.append({"type": "event_msg", "payload": {"type": "user_message", "message": message}})
+        events.append(
+            {
+                "type": "response_item",
+                "payload": {"type": "function_call_output", "call_id": "call_1", "output": "x" * 200},
+            }
+        )
+    path.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+
+
+class CodexHomeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.saved_env = {key: os.environ.get(key) for key in ("HOME", "CODEX_HOME")}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.home = Path(self.tmp.name)
+        self.codex_home = self.home / ".codex"
+        self.codex_home.mkdir()
+        with sqlite3.connect(self.codex_home / "state_5.sqlite") as conn:
+            conn.execute(
+                """
+                CREATE TABLE threads (
+                    id TEXT PRIMARY KEY, title TEXT, source TEXT, cwd TEXT,
+                    created_at INTEGER, updated_at INTEGER, archived INTEGER,
+                    model TEXT, reasoning_effort TEXT, rollout_path TEXT,
+                    agent_role TEXT, agent_nickname TEXT, first_user_message TEXT
+                )
+                """
+            )
+        self.module = load_module(self.home)
+
+    def tearDown(self) -> None:
+        self.module.open_index().close()
+        self.tmp.cleanup()
+        for key, value in self.saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def add_thread(self, thread_id: str, messages: list[str], *, title: str = "", updated_at: int = 1_700_000_000) -> Path:
+        rollout = self.codex_home / "sessions" / "2024" / "01" / "01" / f"rollout-{thread_id}.jsonl"
+        write_rollout(rollout, thread_id, messages)
+        with sqlite3.connect(self.codex_home / "state_5.sqlite") as conn:
+            conn.execute(
+                "INSERT INTO threads VALUES (?, ?, 'cli', ?, ?, ?, 0, 'gpt', 'high', ?, NULL, NULL, ?)",
+                (
+                    thread_id,
+                    title or thread_id,
+                    str(self.home / "dev" / "repo"),
+                    updated_at,
+                    updated_at,
+                    str(rollout),
+                    messages[0] if messages else "",
+                ),
+            )
+        return rollout
+
+    def run_cli(self, *argv: str) -> str:
+        args = self.module.build_parser().parse_args(list(argv))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            args.func(args)
+        return output.getvalue()
+
+    def thread(self, thread_id: str):
+        thread = self.module.fetch_thread_by_id(self.module.STATE_DB, thread_id)
+        assert thread is not None
+        return thread
+
+
+class RolloutIndexTest(CodexHomeTest):
+    def test_user_messages_are_indexed_once(self) -> None:
+        self.add_thread("t1", ["Always run the tests first.", "keep going"])
+        thread = self.thread("t1")
+        self.assertEqual(self.module.collect_user_messages(thread), ["Always run the tests first.", "keep going"])
+
+        self.module.indexed_user_messages.cache_clear()
+        calls = []
+        original = self.module.read_user_messages
+        self.module.read_user_messages = lambda path: calls.append(path) or original(path)
+        self.assertEqual(len(self.module.collect_user_messages(thread)), 2)
+        self.assertEqual(calls, [])
+
+    def test_changed_rollout_is_reindexed(self) -> None:
+        rollout = self.add_thread("t1", ["Always run the tests first."])
+        thread = self.thread("t1")
+        self.module.collect_user_messages(thread)
+        write_rollout(rollout, "t1", ["Always run the tests first.", "Never push to main."])
+        self.assertEqual(self.module.collect_user_messages(thread)[-1], "Never push to main.")
+
+    def test_missing_rollout_has_no_messages(self) -> None:
+        rollout = self.add_thread("t1", ["Always run the tests first."])
+        rollout.unlink()
+        self.assertEqual(self.module.collect_user_messages(self.thread("t1")), [])
+
+    def test_marked_reader_skips_unrelated_lines(self) -> None:
+        rollout = self.add_thread("t1", ["Always run the tests first.", "keep going"])
+        with rollout.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"type": "response_item", "payload": {"type": "user_message"}}) + "\n")
+            handle.write(json.dumps({"type": "event_msg", "payload": {"type": "user_message", "message": "last"}}))
+
+        stats = self.module.RolloutScanStats()
+        events = list(self.module.iter_marked_rollout_events(rollout, self.module.USER_MESSAGE_MARKER, stats))
+        self.assertEqual(len(events), 4)
+        self.assertEqual(stats.bytes_skipped + stats.bytes_decoded, rollout.stat().st_size)
+        self.assertGreater(stats.bytes_skipped, stats.bytes_decoded)
+        self.assertEqual(self.module.read_user_messages(rollout), ["Always run the tests first.", "keep going", "last"])
+
+
+class EventDecodeTest(CodexHomeTest):
+    def test_typed_events_and_backends_agree(self) -> None:
+        rollout = self.add_thread("t1", ["Always run the tests first."])
+        with rollout.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"type": "response_item", "payload": {"type": "function_call", "name": "shell", "arguments": "{}", "call_id": "c1"}}) + "\n")
+            handle.write(json.dumps({"type": "response_item", "payload": {"type": "reasoning"}}) + "\n")
+
+        events = list(self.module.iter_typed_rollout_events(rollout))
+        self.assertEqual([type(event).__name__ for event in events], ["SessionMeta", "EventMsg", "FunctionCallOutput", "FunctionCall"])
+        self.assertEqual(events[0].thread_id, "t1")
+        self.assertEqual(events[1].message, "Always run the tests first.")
+        self.assertEqual(events[3].name, "shell")
+
+        raw = rollout.read_bytes().splitlines()
+        _, fallback = self.module.json_decoder("json")
+        self.assertEqual([self.module.decode_json(line) for line in raw], [fallback(line) for line in raw])
+        with self.assertRaises(SystemExit):
+            self.module.json_decoder("yaml")
+
+
+class FollowTest(CodexHomeTest):
+    def test_follow_decodes_only_appended_lines(self) -> None:
+        rollout = self.add_thread("t1", ["first"])
+        extra = json.dumps({"type": "event_msg", "payload": {"type": "user_message", "message": "second"}}) + "\n"
+        tail = json.dumps({"type": "event_msg", "payload": {"type": "agent_message", "message": "done", "phase": "final"}})
+        appends = [extra[:20], extra[20:], tail]
+
+        def append(_: float) -> None:
+            with rollout.open("a", encoding="utf-8") as handle:
+                handle.write(appends.pop(0) if appends else "")
+
+        batches = list(self.module.iter_followed_events(rollout, interval=0, polls=4, sleep=append))
+        messages = [[event.message for event in batch if isinstance(event, self.module.EventMsg)] for batch in batches]
+        self.assertEqual(messages, [["first"], ["second"], ["done"]])
+        self.assertEqual(
+            self.module.COUNTERS["rollout.bytes_read"],
+            rollout.stat().st_size,
+        )
+
+    def test_follow_rejects_compressed_rollouts(self) -> None:
+        rollout = self.add_thread("t1", ["first"])
+        rollout.write_bytes(gzip.compress(rollout.read_bytes()))
+        with self.assertRaises(SystemExit):
+            next(iter(self.module.iter_followed_events(rollout, interval=0, polls=0)))
+
+
+class ExportTest(CodexHomeTest):
+    def test_export_matches_show_and_skips_missing_rollouts(self) -> None:
+        self.add_thread("t1", ["Always run the tests first."])
+        self.add_thread("t2", ["Never push to main."], updated_at=1_700_000_100)
+        self.add_thread("t3", ["gone"], updated_at=1_700_000_200).unlink()
+        out = self.home / "export"
+
+        summary = self.run_cli("export", str(out), "--jobs", "2")
+        self.assertIn("Exported 2 of 3 thread(s)", summary)
+        self.assertEqual(sorted(path.name for path in out.iterdir()), ["t1.md", "t2.md"])
+        self.assertEqual((out / "t1.md").read_text(encoding="utf-8"), self.run_cli("show", "t1"))
+
+        self.run_cli("export", str(out), "--format", "jsonl", "--query", "push", "--jobs", "1")
+        records = [json.loads(line) for line in (out / "t2.jsonl").read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["thread", "session_meta", "event_msg", "function_call_output"],
+        )
+        self.assertEqual(records[2]["message"], "Never push to main.")
+        self.assertEqual(len(records[3]["output"]), 200)
+
+
+class StatsTest(CodexHomeTest):
+    def test_groups_are_aggregated_in_sql(self) -> None:
+        self.add_thread("t1", ["hi"], updated_at=1_700_000_000)
+        self.add_thread("t2", ["hi"], updated_at=1_700_000_100)
+        self.add_thread("t3", ["hi"], updated_at=1_700_100_000)
+        spawn = {"subagent": {"thread_spawn": {"agent_role": "explorer", "parent_thread_id": "t1"}}}
+        with sqlite3.connect(self.module.STATE_DB) as conn:
+            conn.execute("UPDATE threads SET source = ?, model = '' WHERE id = 't3'", (json.dumps(spawn),))
+
+        argv = ["stats", "--format", "json"]
+        days = json.loads(self.run_cli(*argv))
+        self.assertEqual([(group["day"], group["threads"]) for group in days], [("2023-11-16", 1), ("2023-11-14", 2)])
+        latest = json.loads(self.run_cli(*argv, "--by", "day", "--top", "1"))
+        self.assertEqual([(group["day"], group["threads"]) for group in latest], [("2023-11-16", 1)])
+        by_source = json.loads(self.run_cli(*argv, "--by", "source", "--by", "model"))
+        self.assertEqual([(group["source"], group["model"], group["threads"]) for group in by_source], [("cli", "gpt", 2), ("explorer", "(unknown)", 1)])
+        self.assertEqual(json.loads(self.run_cli(*argv, "--by", "model", "--top", "1", "--source", "cli"))[0]["threads"], 2)
+        self.assertIn("3 thread(s) in 2 group(s).", self.run_cli("stats"))
+
+
+class LatencyTest(CodexHomeTest):
+    def write_calls(self, rollout: Path, calls: list[tuple[str, str, int, int | None]]) -> None:
+        events = [{"timestamp": "2025-01-01T00:00:00.000Z", "type": "session_meta", "payload": {"id": rollout.stem}}]
+        for call_id, name, started, finished in calls:
+            events.append(
+                {
+                    "timestamp": f"2025-01-01T00:00:{started:02d}.000Z",
+                    "type": "response_item",
+                    "payload": {"type": "function_call", "name": name, "arguments": "{}", "call_id": call_id},
+                }
+            )
+            if finished is not None:
+                events.append(
+                    {
+                        "timestamp": f"2025-01-01T00:00:{finished:02d}.500Z",
+                        "type": "response_item",
+                        "payload": {"type": "function_call_output", "call_id": call_id, "output": "ok"},
+                    }
+                )
+        rollout.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+
+    def test_calls_pair_by_call_id_and_aggregate(self) -> None:
+        self.write_calls(self.add_thread("t1", ["hi"]), [("a", "shell", 0, 1), ("b", "read_file", 2, 4), ("c", "shell", 5, None)])
+        self.write_calls(self.add_thread("t2", ["hi"]), [("a", "shell", 0, 3), ("b", "shell", 4, 4)])
+        self.assertEqual(self.module.tool_call_latencies(self.thread("t1")), ([("shell", 1.5), ("read_file", 2.5)], 1))
+        self.assertEqual(self.module.event_time("2025-01-01T00:00:01.500Z"), 1_735_689_601.5)
+        self.assertIsNone(self.module.event_time("not a time"))
+
+        argv = ["latency", "--days", "100000", "--format", "json"]
+        report = json.loads(self.run_cli(*argv))
+        self.assertEqual((report["threads"], report["calls"], report["unanswered"]), (2, 4, 1))
+        shell = report["tool"][0]
+        self.assertEqual((shell["label"], shell["calls"], shell["p50"], shell["p95"], shell["max"]), ("shell", 3, 1.5, 3.5, 3.5))
+        self.assertEqual([row["calls"] for row in report["model"]], [4])
+        self.assertEqual(self.run_cli(*argv, "--jobs", "2"), self.run_cli(*argv))
+
+
+class RolloutPathIndexTest(CodexHomeTest):
+    def test_orphan_lookup_and_incremental_refresh(self) -> None:
+        self.add_thread("t1", ["hello"])
+        archived = self.codex_home / "archived_sessions" / "2023" / "rollout-2023-05-07T17-24-21-t2.jsonl"
+        write_rollout(archived, "t2", ["hello"])
+
+        self.assertEqual(self.module.find_orphan_rollout("t2"), archived)
+        self.assertIsNone(self.module.find_orphan_rollout("t3"))
+
+        stats = self.module.refresh_rollout_paths()
+        self.assertEqual((stats.rollouts, stats.rescanned), (2, 0))
+
+        added = archived.with_name("rollout-t3.jsonl")
+        write_rollout(added, "t3", ["hello"])
+        stats = self.module.refresh_rollout_paths()
+        self.assertEqual((stats.rollouts, stats.rescanned), (3, 1))
+        self.assertEqual(self.module.find_orphan_rollout("t3"), added)
+
+        added.unlink()
+        self.assertEqual(self.module.refresh_rollout_paths().rollouts, 2)
+
+    def test_like_patterns_treat_underscore_literally(self) -> None:
+        write_rollout(self.codex_home / "sessions" / "a_b" / "rollout-t1.jsonl", "t1", ["hello"])
+        sibling = self.codex_home / "sessions" / "axb" / "rollout-tx1.jsonl"
+        write_rollout(sibling, "tx1", ["hello"])
+        self.module.refresh_rollout_paths()
+        self.assertIsNone(self.module.find_orphan_rollout("t_1"))
+
+        conn = self.module.open_index()
+        with conn:
+            self.module.forget_rollout_dir(conn, str(self.codex_home / "sessions" / "a_b"))
+        self.assertEqual([row[0] for row in conn.execute("SELECT path FROM rollout_files")], [str(sibling)])
+
+
+class CompressedRolloutTest(CodexHomeTest):
+    def test_archive_compress_keeps_rollouts_readable(self) -> None:
+        rollout = self.add_thread("t1", ["Always run the tests first.", "keep going"])
+        orphan = self.codex_home / "archived_sessions" / "2023" / "rollout-2023-05-07T17-24-21-t2.jsonl"
+        write_rollout(orphan, "t2", ["hello"])
+        self.assertEqual(self.module.collect_user_messages(self.thread("t1")), ["Always run the tests first.", "keep going"])
+        transcript = self.run_cli("show", "t1")
+        dream = ["dream", "--days", "100000"]
+        self.run_cli(*dream, "--incremental")
+
+        self.assertIn("Compressed 1 rollout(s)", self.run_cli("archive-compress", "--older-than-days", "0"))
+        self.assertTrue(rollout.exists())
+        self.assertIn("Compressed 1 rollout(s)", self.run_cli("archive-compress", "--older-than-days", "0", "--include-active"))
+        self.assertFalse(rollout.exists())
+        compressed = rollout.with_name(rollout.name + ".gz")
+        self.assertEqual(compressed.read_bytes()[:2], b"\x1f\x8b")
+
+        self.module.indexed_user_messages.cache_clear()
+        self.assertEqual(self.module.moved_rollout_path(str(rollout)), compressed)
+        self.assertEqual(self.module.collect_user_messages(self.thread("t1")), ["Always run the tests first.", "keep going"])
+        self.assertEqual(self.run_cli("show", "t1"), transcript.replace(str(rollout), str(compressed)))
+        self.assertEqual(self.module.thread_evidence(self.thread("t1"), "AGENTS.md").rollout_path, str(compressed))
+        # A ledger row written before compression still cites the file's new home.
+        report = self.run_cli(*dream)
+        self.assertIn(str(compressed), report)
+        self.assertEqual(self.run_cli(*dream, "--stream"), report)
+        self.assertEqual(self.run_cli(*dream, "--incremental"), report)
+        self.assertEqual(self.module.find_orphan_rollout("t2"), orphan.with_name(orphan.name + ".gz"))
+
+    def test_codec_is_detected_from_magic_bytes(self) -> None:
+        rollout = self.codex_home / "sessions" / "rollout-t1.jsonl"
+        write_rollout(rollout, "t1", ["Never push to main."])
+        rollout.write_bytes(gzip.compress(rollout.read_bytes()))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            self.assertEqual(self.module.read_user_messages(rollout), ["Never push to main."])
+            self.assertEqual(len(list(self.module.iter_typed_rollout_events(rollout))), 3)
+            gc.collect()
+        self.assertEqual([str(item.message) for item in caught if issubclass(item.category, ResourceWarning)], [])
+
+
+class MarkerMatcherTest(CodexHomeTest):
+    def test_literal_hits_include_overlapping_markers(self) -> None:
+        hits = self.module.literal_hits(self.module.signal_rules().preference, "please keep going, and don't stop")
+        self.assertEqual(hits, {"keep ", "keep going", "don't", "don't stop"})
+
+    def test_preference_classification(self) -> None:
+        looks = self.module.looks_like_preference
+        self.assertTrue(looks("Make sure the tests pass before pushing."))
+        self.assertTrue(looks("Come on, just find it."))
+        self.assertFalse(looks("What should the default be?"))
+        self.assertFalse(looks("fatal: could not read from remote repository, do not retry"))
+
+    def test_normalize_suggestion_rules_and_memo(self) -> None:
+        normalize = self.module.normalize_suggestion
+        normalize.cache_clear()
+        self.assertEqual(
+            normalize("Okay, can you please make sure that the docs reads much more human documentation!"),
+            "The docs read like human-authored documentation.",
+        )
+        normalize("Okay, can you please make sure that the docs reads much more human documentation!")
+        counters = self.module.memo_counters()
+        self.assertEqual((counters["memo.normalize_suggestion.hits"], counters["memo.normalize_suggestion.misses"]), (1, 1))
+
+
+class ProjectTargetTest(CodexHomeTest):
+    def test_repo_listing_is_persisted_and_invalidated_by_mtime(self) -> None:
+        (self.home / "dev" / "widgets").mkdir(parents=True)
+        self.assertEqual(self.module.listed_repo_dirs(self.home / "dev"), ["widgets"])
+        with self.module.open_index() as conn:
+            conn.execute("UPDATE repo_roots SET names = '[\"cached\"]'")
+        self.assertEqual(self.module.listed_repo_dirs(self.home / "dev"), ["cached"])
+
+        (self.home / "dev" / "gadgets").mkdir()
+        self.assertEqual(self.module.listed_repo_dirs(self.home / "dev"), ["gadgets", "widgets"])
+
+    def test_agents_target_is_resolved_once_per_cwd(self) -> None:
+        repo = self.home / "dev" / "widgets"
+        (repo / "src").mkdir(parents=True)
+        (repo / "AGENTS.md").write_text("# Widgets\n", encoding="utf-8")
+        infer = self.module.infer_project_agents_path
+        self.assertEqual(infer(str(repo / "src")), str(repo / "AGENTS.md"))
+        infer(str(repo / "src"))
+        self.assertEqual(infer.cache_info().hits, 1)
+
+
+class SearchIndexTest(CodexHomeTest):
+    def test_query_is_applied_before_limit(self) -> None:
+        self.add_thread("old", ["hello", "Please run pytest with -x."], updated_at=1_700_000_000)
+        for index in range(5):
+            self.add_thread(f"new{index}", ["Unrelated work."], updated_at=1_700_100_000 + index)
+        rows = self.module.fetch_threads(self.module.STATE_DB, limit=2, archived="all", text_query="PYTEST")
+        self.assertEqual([row.thread_id for row in rows], ["old"])
+
+    def test_short_query_and_reindex_on_update(self) -> None:
+        rollout = self.add_thread("t1", ["Ship it."], title="ab")
+        fetch = self.module.fetch_threads
+        self.assertEqual(len(fetch(self.module.STATE_DB, limit=5, archived="all", text_query="ab")), 1)
+        self.assertEqual(fetch(self.module.STATE_DB, limit=5, archived="all", text_query="ruff"), [])
+
+        write_rollout(rollout, "t1", ["Ship it.", "Run ruff first."])
+        with sqlite3.connect(self.module.STATE_DB) as conn:
+            conn.execute("UPDATE threads SET updated_at = updated_at + 1")
+        self.assertEqual(len(fetch(self.module.STATE_DB, limit=5, archived="all", text_query="ruff")), 1)
+
+    def test_like_fallback_without_trigram_tokenizer(self) -> None:
+        self.module.THREAD_SEARCH_FTS = self.module.THREAD_SEARCH_FTS.replace("trigram", "no_such_tokenizer")
+        self.add_thread("t1", ["Please run pytest with -x."], title="a_b")
+        self.add_thread("t2", ["Unrelated work."], title="axb")
+        fetch = self.module.fetch_threads
+        self.assertFalse(self.module.thread_search_is_fts(self.module.open_index()))
+        self.assertEqual([row.thread_id for row in fetch(self.module.STATE_DB, limit=5, archived="all", text_query="PYTEST")], ["t1"])
+        self.assertEqual([row.thread_id for row in fetch(self.module.STATE_DB, limit=5, archived="all", text_query="a_b")], ["t1"])
+
+
+class StateDbTest(CodexHomeTest):
+    def test_reads_are_read_only_and_do_not_wait_on_writers(self) -> None:
+        self.add_thread("t1", ["Ship it."])
+        writer = sqlite3.connect(self.module.STATE_DB, isolation_level=None)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("UPDATE threads SET title = 'pending'")
+        try:
+            rows = self.module.fetch_threads(self.module.STATE_DB, limit=5, archived="all")
+            self.assertEqual([(row.thread_id, row.title) for row in rows], [("t1", "t1")])
+            self.assertEqual(self.thread("t1").title, "t1")
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+        conn = self.module.open_state_db(self.module.STATE_DB)
+        self.assertIs(conn, self.module.open_state_db(self.module.STATE_DB))
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM threads")
+
+
+class DreamTest(CodexHomeTest):
+    def seed_preferences(self) -> None:
+        for index in range(6):
+            self.add_thread(
+                f"t{index}",
+                [
+                    "Always run the full test suite before committing.",
+                    f"Make sure the README for widget {index % 2} stays in sync with the code.",
+                    "keep going",
+                ],
+                title=f"task {index}",
+                updated_at=1_700_000_000 + index * 86_400,
+            )
+
+    def proposal_view(self, proposals) -> list[tuple]:
+        return [
+            (item.bucket, item.target, item.suggestion, item.support, [e.thread_id for e in item.evidence])
+            for item in proposals
+        ]
+
+    def test_proposal_dedupes_threads_and_freezes_confidence(self) -> None:
+        proposal = self.module.Proposal(bucket="Global AGENTS.md", target="AGENTS.md", suggestion="Keep going.")
+        for thread_id, cluster_key in (("t1", "a"), ("t1", "a"), ("t2", "a"), ("t3", "b")):
+            proposal.add_evidence(self.module.Evidence(thread_id, "", 10, "", "", cluster_key))
+        self.assertEqual([item.thread_id for item in proposal.evidence], ["t1", "t2", "t3"])
+        self.assertEqual(proposal.support, 2)
+        self.assertEqual(proposal.freeze().confidence, self.module.proposal_confidence("Global AGENTS.md", "Keep going.", 2))
+        if sys.version_info >= (3, 10):
+            self.assertFalse(hasattr(proposal, "__dict__"))
+
+    def test_incremental_dream_matches_full_run(self) -> None:
+        self.seed_preferences()
+        dream = ("dream", "--days", "100000", "--emit-patch")
+        # Cold sidecar: pool workers fill signal_cache while the parent writes the ledger.
+        self.assertEqual(self.run_cli(*dream, "--incremental", "--jobs", "2"), self.run_cli(*dream))
+        self.assertEqual(self.run_cli(*dream, "--incremental"), self.run_cli(*dream))
+
+        self.add_thread("t9", ["Always run the full test suite before committing."], updated_at=1_700_900_000)
+        rollout = self.thread("t0").rollout_path
+        write_rollout(Path(rollout), "t0", ["Never force-push to the shared release branch."])
+        with sqlite3.connect(self.module.STATE_DB) as conn:
+            conn.execute("UPDATE threads SET updated_at = 1700950000 WHERE id = 't0'")
+
+        calls = []
+        original = self.module.extract_preference_signals
+        self.module.extract_preference_signals = lambda thread: calls.append(thread.thread_id) or original(thread)
+        incremental = self.run_cli(*dream, "--incremental")
+        self.assertEqual(sorted(calls), ["t0", "t9"])
+        self.assertEqual(incremental, self.run_cli(*dream))
+        self.assertIn("force-push", incremental)
+
+    def test_incremental_dream_reclassifies_and_honours_limit(self) -> None:
+        self.seed_preferences()
+        dream = ("dream", "--days", "100000", "--emit-patch", "--limit", "4")
+        self.run_cli(*dream, "--incremental")
+
+        # A new AGENTS.MD moves project proposals; the ledger must not keep the old target.
+        repo = self.home / "dev" / "repo"
+        repo.mkdir(parents=True)
+        (repo / "AGENTS.MD").write_text("# Repo\n", encoding="utf-8")
+        self.module.infer_project_agents_path.cache_clear()
+        self.add_thread("t9", ["Make sure the README for widget 1 stays in sync with the code."], updated_at=1_700_900_000)
+
+        incremental = self.run_cli(*dream, "--incremental")
+        self.assertEqual(incremental, self.run_cli(*dream))
+        self.assertIn("AGENTS.MD", incremental)
+        self.assertIn("Analyzed 4 top-level user threads", incremental)
+
+    def test_signal_cache_is_keyed_on_content_and_rules(self) -> None:
+        self.add_thread("t1", ["Always run the full test suite before committing."])
+        self.add_thread("t2", ["Always run the full test suite before committing."], updated_at=1_700_000_100)
+        thread = self.thread("t1")
+        expected = self.module.extract_preference_signals(thread)
+        self.assertTrue(expected)
+
+        calls = []
+        original = self.module.extract_signals_from_messages
+        self.module.extract_signals_from_messages = lambda messages: calls.append(messages) or original(messages)
+        self.assertEqual(self.module.extract_preference_signals(self.thread("t2")), expected)
+        self.assertEqual(calls, [])
+
+        self.module.PREFERENCE_MARKERS = (*self.module.PREFERENCE_MARKERS, "from now on")
+        self.module.signal_rules_fingerprint.cache_clear()
+        self.assertEqual(self.module.extract_preference_signals(thread), expected)
+        self.assertEqual(len(calls), 1)
+
+    def test_stream_matches_full_run(self) -> None:
+        self.seed_preferences()
+        for extra in ([], ["--max-per-bucket", "1"], ["--min-support", "2", "--jobs", "2"]):
+            argv = ["dream", "--days", "100000", "--min-confidence", "0", "--emit-patch", *extra]
+            self.assertEqual(self.run_cli(*argv, "--stream"), self.run_cli(*argv))
+
+    def test_merge_similar_combines_near_duplicate_phrasings(self) -> None:
+        phrasings = (
+            "Always run the full test suite before committing.",
+            "Always run the test suite before committing.",
+            "Always run the full test suite before committing.",
+        )
+        for index, phrasing in enumerate(phrasings):
+            self.add_thread(f"t{index}", [phrasing], title=f"task {index}", updated_at=1_700_000_000 + index * 86_400)
+        self.add_thread("t9", ["Never push directly to the main branch."], title="other")
+        rows = self.module.fetch_threads(self.module.STATE_DB, limit=50, archived="all")
+
+        separate = self.module.collect_proposals(rows, min_support=2)
+        merged = self.module.collect_proposals(rows, min_support=2, merge_similar=True)
+        self.assertEqual([(item.suggestion, item.support) for item in separate], [(phrasings[0], 2)])
+        self.assertEqual([(item.suggestion, item.support) for item in merged], [(phrasings[0], 3)])
+        self.assertEqual([item.thread_id for item in merged[0].evidence], ["t2", "t1", "t0"])
+
+    def test_near_duplicate_clusters_stay_within_scope(self) -> None:
+        texts = ["Always run the test suite before committing."] * 2 + ["Prefer small focused pull requests."]
+        clusters = self.module.near_duplicate_clusters(texts, ["a", "b", "a"])
+        self.assertEqual(sorted(clusters), [[0], [1], [2]])
+
+    def test_parallel_extraction_matches_serial(self) -> None:
+        self.seed_preferences()
+        rows = self.module.fetch_threads(self.module.STATE_DB, limit=50, archived="all")
+        serial = self.module.collect_proposals(rows, min_support=1)
+        parallel = self.module.collect_proposals(rows, min_support=1, jobs=3)
+        self.assertTrue(serial)
+        self.assertEqual(self.proposal_view(serial), self.proposal_view(parallel))
+
+
+class ProfileTest(CodexHomeTest):
+    def run_profiled(self, *argv: str) -> dict:
+        stderr = io.StringIO()
+        with unittest.mock.patch.object(sys, "argv", ["self_improve.py", *argv]), contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(stderr):
+            self.module.main()
+        return json.loads(stderr.getvalue()[stderr.getvalue().index("{") :])
+
+    def test_profile_summary_and_trace(self) -> None:
+        # Distinct messages: each worker has its own memo, so a shared message could
+        # miss in both processes and the hit count would depend on scheduling.
+        self.add_thread("t1", ["Always run the tests before you commit."])
+        self.add_thread("t2", ["Always rebase onto main before you push."])
+        trace = self.home / "trace.json"
+        summary = self.run_profiled("dream", "--days", "100000", "--profile-trace", str(trace), "--jobs", "2")
+
+        self.assertEqual(summary["stages"]["extract_preference_signals"]["calls"], 2)
+        self.assertEqual(summary["stages"]["collect_user_messages"]["calls"], 2)
+        self.assertEqual(summary["stages"]["emit_dream_report"]["calls"], 1)
+        self.assertGreater(summary["bytes"]["rollout_scanned"], 0)
+        self.assertEqual(summary["caches"]["cache.signal_cache"], {"hits": 0, "misses": 2, "hit_rate": 0.0})
+        events = json.loads(trace.read_text(encoding="utf-8"))["traceEvents"]
+        self.assertIn("dream", {event["name"] for event in events if event["ph"] == "X"})
+
+    def test_transcript_stage_counts_rendered_transcripts(self) -> None:
+        self.add_thread("t1", ["Always run the tests first."])
+        self.add_thread("t2", ["Never push to main."])
+        self.assertEqual(self.run_profiled("show", "t1", "--profile")["stages"]["emit_transcript"]["calls"], 1)
+        self.module.COUNTERS.clear()
+        summary = self.run_profiled("export", str(self.home / "export"), "--profile", "--jobs", "1")
+        self.assertEqual(summary["stages"]["emit_transcript"]["calls"], 2)
+        self.module.COUNTERS.clear()
+        self.assertNotIn("emit_transcript", self.run_profiled("dream", "--days", "100000", "--profile")["stages"])
+
+    def test_stream_times_the_cursor_as_fetch_threads(self) -> None:
+        self.add_thread("t1", ["Always run the tests before you commit."])
+        self.add_thread("t2", ["Always rebase onto main before you push."])
+        stages = self.run_profiled("dream", "--days", "100000", "--profile", "--stream")["stages"]
+        self.assertEqual(stages["fetch_threads"]["calls"], 1)
+        self.assertEqual(stages["extract_preference_signals"]["calls"], 2)
+
+    def test_serial_run_counts_signal_cache_hits(self) -> None:
+        self.add_thread("t1", ["Always run the tests before you commit."])
+        self.add_thread("t2", ["Always run the tests before you commit."])
+        summary = self.run_profiled("dream", "--days", "100000", "--profile", "--jobs", "1")
+        self.assertEqual(summary["caches"]["cache.signal_cache"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+
+class SkillAuditTest(CodexHomeTest):
+    def add_skill(self, name: str, body: str) -> Path:
+        skill_file = self.codex_home / "skills" / name / "SKILL.md"
+        skill_file.parent.mkdir(parents=True)
+        skill_file.write_text(f"---\nname: {name}\n---\n\n{body}\n", encoding="utf-8")
+        return skill_file
+
+    def test_documented_suggestions_use_precomputed_signatures(self) -> None:
+        self.add_skill(
+            "deploy",
+            "# Deploy\n\n- Always tag the release commit before pushing the production branch\n- Ship small diffs.",
+        )
+        skill = self.module.load_skill_records()[0]
+        self.assertTrue(skill.shingle_index)
+        documented = self.module.suggestion_already_documented
+        self.assertTrue(documented(skill, "Always tag the release commits before pushing the production branch."))
+        self.assertFalse(documented(skill, "Prefer pnpm over npm for workspace installs."))
+        self.assertTrue(self.module.near_duplicate_segment(skill, "Always tag the release commit before pushing the production branches."))
+        self.assertFalse(self.module.near_duplicate_segment(skill, "Always tag the release."))
+
+    def test_alias_matcher_matches_naive_scan(self) -> None:
+        # A four-letter alphabet makes overlapping, nested and prefix aliases common.
+        rng = random.Random(20240101)
+        for _ in range(500):
+            owners: dict[str, set[int]] = {}
+            for _ in range(rng.randint(1, 8)):
+                alias = "".join(rng.choice("ab-$") for _ in range(rng.randint(1, 5)))
+                owners.setdefault(alias, set()).add(rng.randrange(6))
+            haystack = "".join(rng.choice("ab-$ ") for _ in range(rng.randint(0, 40)))
+            naive = {index for alias, indexes in owners.items() if alias in haystack for index in indexes}
+            matcher = self.module.build_literal_matcher(owners)
+            self.assertEqual(self.module.literal_hits(matcher, haystack), naive, (owners, haystack))
+
+        for name in ("gh", "gh-commit", "yeet", "loop"):
+            self.add_skill(name, "Body.")
+        skills = list(self.module.load_skill_records())
+        matcher = self.module.build_alias_matcher(skills)
+        self.add_thread("t1", ["Use $gh-commit and then yeet it."], title="misc")
+        thread = self.thread("t1")
+        messages = self.module.collect_user_messages(thread)
+
+        haystack = " ".join([thread.title, thread.cwd, *messages]).lower()
+        naive = {index for index, skill in enumerate(skills) if any(alias in haystack for alias in skill.aliases)}
+        self.assertEqual(self.module.matching_skills(matcher, thread, messages), naive)
+        self.assertEqual({skills[index].name for index in naive}, {"gh", "gh-commit", "yeet"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,12 @@ while IFS= read -r -d '' test_file; do
   fi
 done < <(find "$ROOT_DIR/tests" -maxdepth 1 -type f -name 'test_*.sh' -print0 | sort -z)
 
+echo "==> agents/skills/self-improve/tests"
+if ! (cd "$ROOT_DIR" && python3 -m unittest discover agents/skills/self-improve/tests); then
+  echo "FAILED: agents/skills/self-improve/tests" >&2
+  failures=$((failures + 1))
+fi
+
 if [ "$failures" -ne 0 ]; then
   echo ""
   echo "Tests failed: $failures" >&2